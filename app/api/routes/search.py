@@ -2,21 +2,31 @@
 Search API endpoints for semantic search
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Request
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
+import json
 import time
 
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-
-from app.db.database import get_db
+from app.db.database import get_async_db
+from app.middleware.rate_limit import SEARCH_RATE_LIMIT, SEARCH_RATE_LIMIT_SCOPE, batch_search_cost, limiter
 from app.models.song import Song
-from app.services.embedding_service import EmbeddingService
-from app.api.schemas import SearchRequest, SearchResponse, SongSearchResult, SongResponse
+from app.services.embedding_service import EmbeddingAPIError, EmbeddingService, get_embedding_service, get_hnsw_params
+from app.services.search_cache import search_cache, shared_search_cache
+from app.services.vector_index import vector_index
+from app.api.schemas import (
+    BatchSearchRequest, BatchSearchResponse, SearchRequest, SearchResponse, SongSearchResult, SongResponse
+)
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
+
+async def embeddings_available(db: AsyncSession) -> bool:
+    """
+    Return whether any song has an embedding (LIMIT 1 probe, no full count)
+    """
+    probe = select(Song.id).where(Song.embedding.is_not(None)).limit(1)
+    return (await db.execute(probe)).first() is not None
 
 
 @router.post(
@@ -27,11 +37,12 @@ limiter = Limiter(key_func=get_remote_address)
     response_description="Lista de músicas ordenadas por similaridade semântica",
     tags=["🔍 Busca Semântica"]
 )
-@limiter.limit("10/minute")  # Máximo 10 buscas por minuto por IP
+@limiter.shared_limit(SEARCH_RATE_LIMIT, scope=SEARCH_RATE_LIMIT_SCOPE)  # Máximo 10 buscas por minuto por IP
 async def semantic_search(
     request: Request,
     search_request: SearchRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    embedding_service: EmbeddingService = Depends(get_embedding_service)
 ):
     """
     ## 🎯 Busca Semântica Inteligente
@@ -59,6 +70,7 @@ async def semantic_search(
     - **query**: Descreva o sentimento, tema ou mood que você procura
     - **limit**: Número máximo de resultados (1-20, padrão: 10)  
     - **similarity_threshold**: Score mínimo de similaridade (0.0-1.0, padrão: 0.0)
+    - **include_lyrics**: Incluir as letras nos resultados (padrão: true)
     
     ### 🛡️ Limitações de Segurança
     
@@ -77,47 +89,103 @@ async def semantic_search(
     start_time = time.time()
     
     try:
-        # Check if we have any embeddings
-        songs_with_embeddings = db.query(Song).filter(Song.embedding.isnot(None)).count()
-        
-        if songs_with_embeddings == 0:
-            raise HTTPException(
-                status_code=503,
-                detail="Semantic search is not available. No embeddings found. Please run embedding generation first."
+        # Tier 1 cache: exact match on the normalized query text
+        cache_params = (
+            search_request.limit,
+            search_request.similarity_threshold,
+            search_request.include_lyrics
+        )
+        cached = search_cache.get_exact(search_request.query, cache_params)
+        if cached is not None:
+            return SearchResponse.model_construct(
+                **cached,
+                query=search_request.query,
+                processing_time_ms=round((time.time() - start_time) * 1000, 2)
             )
         
-        # Initialize embedding service
-        embedding_service = EmbeddingService()
-        
         # Generate query embedding
         try:
-            query_embedding = embedding_service.generate_query_embedding(search_request.query)
+            query_embedding = await embedding_service.generate_query_embedding(search_request.query)
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to generate query embedding: {str(e)}"
             )
         
+        # Tier 2 cache: a previous query with an almost identical embedding
+        cached = search_cache.get_similar(query_embedding, cache_params)
+        if cached is not None:
+            return SearchResponse.model_construct(
+                **cached,
+                query=search_request.query,
+                processing_time_ms=round((time.time() - start_time) * 1000, 2)
+            )
+        
+        # Tier 3 cache (Redis, shared by every worker): same embedding already searched
+        if shared_search_cache is not None:
+            shared = await shared_search_cache.get(query_embedding, cache_params)
+            if shared is not None:
+                # O JSON do Redis traz datas como strings: os resultados são validados
+                # (uma vez) para voltarem a ser modelos, como nos outros tiers
+                cached = {
+                    "results": [SongSearchResult.model_validate(result) for result in shared["results"]],
+                    "total_results": shared["total_results"]
+                }
+                search_cache.set(search_request.query, query_embedding, cache_params, cached)
+                return SearchResponse.model_construct(
+                    **cached,
+                    query=search_request.query,
+                    processing_time_ms=round((time.time() - start_time) * 1000, 2)
+                )
+        
         # Search for similar songs
-        results = embedding_service.search_similar_songs(
+        results = await embedding_service.search_similar_songs(
             db=db,
             query_embedding=query_embedding,
             limit=search_request.limit,
-            threshold=search_request.similarity_threshold
+            threshold=search_request.similarity_threshold,
+            include_lyrics=search_request.include_lyrics
         )
         
-        # Convert results to response format
+        # Só quando a busca volta vazia vale perguntar se existe algum embedding
+        if not results and not await embeddings_available(db):
+            raise HTTPException(
+                status_code=503,
+                detail="Semantic search is not available. No embeddings found. Please run embedding generation first."
+            )
+        
+        # Convert results to response format. The outer models are built with
+        # model_construct: the song is validated once and the score comes from pgvector.
         search_results = [
-            SongSearchResult(
-                song=SongResponse.from_orm(song),
-                similarity=song.similarity_score
+            SongSearchResult.model_construct(
+                song=SongResponse.from_orm(hit.song, include_lyrics=search_request.include_lyrics),
+                similarity=hit.similarity
             )
-            for song in results
+            for hit in results
         ]
         
+        search_cache.set(
+            search_request.query,
+            query_embedding,
+            cache_params,
+            {
+                "results": search_results,
+                "total_results": len(search_results)
+            }
+        )
+        if shared_search_cache is not None:
+            await shared_search_cache.set(
+                query_embedding,
+                cache_params,
+                {
+                    "results": [result.model_dump() for result in search_results],
+                    "total_results": len(search_results)
+                }
+            )
+        
         processing_time = (time.time() - start_time) * 1000
         
-        return SearchResponse(
+        return SearchResponse.model_construct(
             query=search_request.query,
             results=search_results,
             total_results=len(search_results),
@@ -130,71 +198,186 @@ async def semantic_search(
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
 
-@router.get("/search/suggestions")
-async def get_search_suggestions():
+@router.post(
+    "/search/batch",
+    response_model=BatchSearchResponse,
+    summary="🔍 Busca Semântica em Lote",
+    description="Várias consultas em uma requisição: um único pedido de embeddings e buscas em paralelo",
+    tags=["🔍 Busca Semântica"]
+)
+@limiter.shared_limit(SEARCH_RATE_LIMIT, scope=SEARCH_RATE_LIMIT_SCOPE, cost=batch_search_cost)  # Cada consulta do lote conta como uma busca
+async def batch_semantic_search(
+    request: Request,
+    batch_request: BatchSearchRequest,
+    db: AsyncSession = Depends(get_async_db),
+    embedding_service: EmbeddingService = Depends(get_embedding_service)
+):
     """
-    Get example search queries that work well with semantic search
+    Run up to 10 semantic searches at once (same options for every query)
+    
+    Each query counts against the same 10 searches/minute per IP as /search.
     """
-    return {
-        "suggestions": [
-            {
-                "category": "Emotions",
-                "queries": [
-                    "heartbreak and sadness",
-                    "joy and happiness",
-                    "anger and frustration",
-                    "nostalgia and memories",
-                    "hope and optimism"
-                ]
-            },
-            {
-                "category": "Themes",
-                "queries": [
-                    "love and romance",
-                    "friendship and loyalty",
-                    "success and ambition",
-                    "freedom and independence",
-                    "family and home"
-                ]
-            },
-            {
-                "category": "Moods",
-                "queries": [
-                    "party and dancing",
-                    "chill and relaxing",
-                    "motivation and energy",
-                    "peaceful and calm",
-                    "rebellious and edgy"
-                ]
-            },
-            {
-                "category": "Life Events",
-                "queries": [
-                    "breakup and moving on",
-                    "celebration and victory",
-                    "overcoming challenges",
-                    "growing up and maturing",
-                    "new beginnings"
+    start_time = time.time()
+    
+    try:
+        cache_params = (
+            batch_request.limit,
+            batch_request.similarity_threshold,
+            batch_request.include_lyrics
+        )
+        # Tier 1 cache por consulta: só as que faltam vão à API de embeddings
+        responses_by_query = {}
+        for query in batch_request.queries:
+            cached = search_cache.get_exact(query, cache_params)
+            if cached is not None:
+                responses_by_query[query] = cached
+        misses = [query for query in dict.fromkeys(batch_request.queries) if query not in responses_by_query]
+        
+        if misses:
+            try:
+                query_embeddings = await embedding_service.generate_query_embeddings(misses)
+            except EmbeddingAPIError as e:
+                raise HTTPException(status_code=500, detail=f"Failed to generate query embeddings: {str(e)}")
+            
+            # Tier 2 cache: consultas com embedding quase idêntico a uma anterior
+            to_search = []
+            for query, query_embedding in zip(misses, query_embeddings):
+                cached = search_cache.get_similar(query_embedding, cache_params)
+                if cached is not None:
+                    responses_by_query[query] = cached
+                else:
+                    to_search.append((query, query_embedding))
+            
+            batches = await embedding_service.batch_search(
+                [query_embedding for _, query_embedding in to_search],
+                limit=batch_request.limit,
+                threshold=batch_request.similarity_threshold,
+                include_lyrics=batch_request.include_lyrics
+            )
+            
+            if to_search and not any(batches) and not await embeddings_available(db):
+                raise HTTPException(
+                    status_code=503,
+                    detail="Semantic search is not available. No embeddings found. Please run embedding generation first."
+                )
+            
+            for (query, query_embedding), hits in zip(to_search, batches):
+                results = [
+                    SongSearchResult.model_construct(
+                        song=SongResponse.from_orm(hit.song, include_lyrics=batch_request.include_lyrics),
+                        similarity=hit.similarity
+                    )
+                    for hit in hits
                 ]
-            }
-        ],
-        "tips": [
-            "Use descriptive phrases rather than single words",
-            "Combine emotions with themes for better results",
-            "Try different phrasings if you don't get good results",
-            "Lower the similarity threshold to get more results"
+                responses_by_query[query] = {"results": results, "total_results": len(results)}
+                search_cache.set(query, query_embedding, cache_params, responses_by_query[query])
+        
+        processing_time_ms = round((time.time() - start_time) * 1000, 2)
+        responses = [
+            SearchResponse.model_construct(
+                **responses_by_query[query],
+                query=query,
+                processing_time_ms=processing_time_ms
+            )
+            for query in batch_request.queries
         ]
-    }
+        
+        return BatchSearchResponse.model_construct(results=responses, processing_time_ms=processing_time_ms)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+
+SEARCH_SUGGESTIONS = {
+    "suggestions": [
+        {
+            "category": "Emotions",
+            "queries": [
+                "heartbreak and sadness",
+                "joy and happiness",
+                "anger and frustration",
+                "nostalgia and memories",
+                "hope and optimism"
+            ]
+        },
+        {
+            "category": "Themes",
+            "queries": [
+                "love and romance",
+                "friendship and loyalty",
+                "success and ambition",
+                "freedom and independence",
+                "family and home"
+            ]
+        },
+        {
+            "category": "Moods",
+            "queries": [
+                "party and dancing",
+                "chill and relaxing",
+                "motivation and energy",
+                "peaceful and calm",
+                "rebellious and edgy"
+            ]
+        },
+        {
+            "category": "Life Events",
+            "queries": [
+                "breakup and moving on",
+                "celebration and victory",
+                "overcoming challenges",
+                "growing up and maturing",
+                "new beginnings"
+            ]
+        }
+    ],
+    "tips": [
+        "Use descriptive phrases rather than single words",
+        "Combine emotions with themes for better results",
+        "Try different phrasings if you don't get good results",
+        "Lower the similarity threshold to get more results"
+    ]
+}
+
+# The suggestions never change at runtime: serialize them once at import
+SUGGESTIONS_BYTES = json.dumps(SEARCH_SUGGESTIONS, ensure_ascii=False).encode("utf-8")
+SUGGESTIONS_ETAG = '"' + hashlib.sha256(SUGGESTIONS_BYTES).hexdigest()[:16] + '"'
+SUGGESTIONS_HEADERS = {
+    "Cache-Control": "public, max-age=3600",
+    "ETag": SUGGESTIONS_ETAG
+}
+
+
+@router.get("/search/suggestions")
+async def get_search_suggestions(request: Request):
+    """
+    Get example search queries that work well with semantic search
+    """
+    if request.headers.get("if-none-match") == SUGGESTIONS_ETAG:
+        return Response(status_code=304, headers=SUGGESTIONS_HEADERS)
+    
+    return Response(
+        content=SUGGESTIONS_BYTES,
+        media_type="application/json",
+        headers=SUGGESTIONS_HEADERS
+    )
 
 
 @router.get("/search/status")
-async def get_search_status(db: Session = Depends(get_db)):
+async def get_search_status(
+    exact: bool = Query(False, description="Exact COUNT(*) instead of planner estimates"),
+    db: AsyncSession = Depends(get_async_db),
+    embedding_service: EmbeddingService = Depends(get_embedding_service)
+):
     """
     Get the current status of the search system
+    
+    - **exact**: Counts are planner estimates unless exact=true
     """
     try:
-        embedding_service = EmbeddingService()
-        stats = embedding_service.get_embedding_statistics(db)
+        stats = await embedding_service.get_embedding_statistics(db, exact=exact)
         
         return {
             "search_available": stats["songs_with_embeddings"] > 0,
@@ -202,7 +385,9 @@ async def get_search_status(db: Session = Depends(get_db)):
             "songs_with_embeddings": stats["songs_with_embeddings"], 
             "embedding_coverage": stats["embedding_coverage"],
             "embedding_model": stats["embedding_model"],
-            "embedding_dimensions": stats["embedding_dimensions"]
+            "embedding_dimensions": stats["embedding_dimensions"],
+            "hnsw": get_hnsw_params(),
+            "vector_backend": vector_index.stats() if vector_index is not None else {"backend": "pgvector"}
         }
         
     except Exception as e:
@@ -3,71 +3,111 @@ Songs API endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, literal_column
 from typing import List, Optional
-import math
+import base64
+import binascii
 
-from app.db.database import get_db
-from app.models.song import Song
+from app.config import settings
+from app.db.database import get_async_db, estimate_row_count_async
+from app.models.song import Song, song_load_options
 from app.api.schemas import SongResponse, PaginatedResponse
+from app.utils.ttl_cache import TTLCache
 
 router = APIRouter()
 
+# Text search configuration; must match the idx_songs_lyrics_fts expression index
+LYRICS_TS_CONFIG = literal_column("'simple'")
+
+
+def lyrics_match(search: str):
+    """Full-text predicate on lyrics served by the idx_songs_lyrics_fts GIN index"""
+    return func.to_tsvector(LYRICS_TS_CONFIG, Song.lyrics).op('@@')(
+        func.websearch_to_tsquery(LYRICS_TS_CONFIG, search)
+    )
+
+
+def encode_cursor(last_id: int) -> str:
+    """Encode the last returned song id as an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> int:
+    """Decode a pagination cursor back into the last returned song id"""
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+async def approximate_song_count(db: AsyncSession) -> Optional[int]:
+    """Planner estimate of the songs row count (catalog lookup instead of COUNT(*))"""
+    return await estimate_row_count_async(db, "songs")
+
+
+# Artist counts change slowly: cache the /artists response per limit
+_artists_cache = TTLCache(settings.ARTISTS_CACHE_TTL)
+
 
 @router.get("/songs", response_model=PaginatedResponse)
 async def list_songs(
-    page: int = Query(1, description="Page number", ge=1),
+    cursor: Optional[str] = Query(None, description="Cursor returned as next_cursor by the previous page"),
     per_page: int = Query(20, description="Items per page", ge=1, le=100),
     artist: Optional[str] = Query(None, description="Filter by artist name"),
     year: Optional[int] = Query(None, description="Filter by release year"),
     search: Optional[str] = Query(None, description="Search in song title or lyrics"),
-    db: Session = Depends(get_db)
+    include_lyrics: bool = Query(True, description="Include the full lyrics of each song"),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
-    List songs with optional filtering and pagination
+    List songs with optional filtering and cursor (keyset) pagination
     
-    - **page**: Page number (starts at 1)
+    - **cursor**: Opaque cursor from the previous page's `next_cursor` (omit for the first page)
     - **per_page**: Number of songs per page (max 100)
     - **artist**: Filter by artist name (partial match)
     - **year**: Filter by release year
-    - **search**: Search in song title or lyrics (partial match)
+    - **search**: Search in song title (partial match) or lyrics (word match)
+    - **include_lyrics**: Set to false to skip fetching lyrics
     """
     try:
-        # Build query
-        query = db.query(Song)
+        # Build query (only the columns exposed by the API)
+        query = select(Song).options(song_load_options(include_lyrics))
         
         # Apply filters
         if artist:
-            query = query.filter(Song.artist_name.ilike(f"%{artist}%"))
+            query = query.where(Song.artist_name.ilike(f"%{artist}%"))
         
         if year:
-            query = query.filter(Song.year == year)
+            query = query.where(Song.year == year)
             
         if search:
-            query = query.filter(
+            # track_name ILIKE uses the trigram index; lyrics use full-text search
+            query = query.where(
                 (Song.track_name.ilike(f"%{search}%")) |
-                (Song.lyrics.ilike(f"%{search}%"))
+                lyrics_match(search)
             )
         
-        # Get total count
-        total = query.count()
+        # Keyset pagination: continue after the last id of the previous page
+        if cursor:
+            query = query.where(Song.id > decode_cursor(cursor))
         
-        # Calculate pagination
-        total_pages = math.ceil(total / per_page)
-        offset = (page - 1) * per_page
+        # Fetch one extra row to know whether there is a next page
+        songs = (await db.execute(query.order_by(Song.id).limit(per_page + 1))).scalars().all()
+        has_more = len(songs) > per_page
+        songs = songs[:per_page]
         
-        # Get paginated results
-        songs = query.offset(offset).limit(per_page).all()
+        filtered = bool(artist or year or search)
         
         return PaginatedResponse(
-            items=[SongResponse.from_orm(song) for song in songs],
-            total=total,
-            page=page,
+            items=[SongResponse.from_orm(song, include_lyrics=include_lyrics) for song in songs],
+            total=None if filtered else await approximate_song_count(db),
             per_page=per_page,
-            total_pages=total_pages
+            next_cursor=encode_cursor(songs[-1].id) if has_more else None
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching songs: {str(e)}")
 
@@ -75,7 +115,7 @@ async def list_songs(
 @router.get("/songs/{song_id}", response_model=SongResponse)
 async def get_song(
     song_id: int,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get a specific song by ID
@@ -83,7 +123,9 @@ async def get_song(
     - **song_id**: The ID of the song to retrieve
     """
     try:
-        song = db.query(Song).filter(Song.id == song_id).first()
+        song = (await db.execute(
+            select(Song).options(song_load_options()).where(Song.id == song_id)
+        )).scalar_one_or_none()
         
         if not song:
             raise HTTPException(status_code=404, detail="Song not found")
@@ -99,7 +141,7 @@ async def get_song(
 @router.get("/artists", response_model=List[dict])
 async def list_artists(
     limit: int = Query(50, description="Maximum number of artists", ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     List all artists with song counts
@@ -107,8 +149,12 @@ async def list_artists(
     - **limit**: Maximum number of artists to return
     """
     try:
-        # Use SQLAlchemy ORM instead of raw SQL
-        result = db.execute(
+        cached = _artists_cache.get(limit)
+        if cached is not None:
+            return cached
+        
+        # GROUP BY artist_name is served by an index-only scan on idx_songs_artist_name
+        result = await db.execute(
             select(
                 Song.artist_name,
                 func.count().label('song_count')
@@ -126,6 +172,7 @@ async def list_artists(
             for row in result
         ]
         
+        _artists_cache.set(limit, artists)
         return artists
         
     except Exception as e:
@@ -136,7 +183,7 @@ async def list_artists(
 async def get_songs_by_artist(
     artist_name: str,
     limit: int = Query(20, description="Maximum number of songs", ge=1, le=100),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get songs by a specific artist
@@ -145,9 +192,11 @@ async def get_songs_by_artist(
     - **limit**: Maximum number of songs to return
     """
     try:
-        songs = db.query(Song).filter(
-            Song.artist_name.ilike(f"%{artist_name}%")
-        ).limit(limit).all()
+        songs = (await db.execute(
+            select(Song).options(song_load_options()).where(
+                Song.artist_name.ilike(f"%{artist_name}%")
+            ).limit(limit)
+        )).scalars().all()
         
         if not songs:
             raise HTTPException(status_code=404, detail=f"No songs found for artist: {artist_name}")
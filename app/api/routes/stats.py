@@ -2,21 +2,70 @@
 Statistics API endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import select, func, case
-from typing import List, Dict
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, literal_column, Text
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+import hashlib
+import orjson
 
-from app.db.database import get_db
+from app.config import settings
+from app.db.database import AsyncSessionLocal, get_async_db, estimate_row_count_async
 from app.models.song import Song
-from app.services.embedding_service import EmbeddingService
+from app.models.stats_views import mv_song_stats, mv_artist_stats, mv_year_stats, artist_summary
+from app.services.embedding_service import EMBEDDED_SONGS_INDEX_NAME
 from app.api.schemas import StatsResponse
+from app.utils.ttl_cache import TTLCache
 
 router = APIRouter()
 
+# Agregados sobre a tabela inteira mudam pouco: cachear por endpoint + parâmetros
+stats_cache = TTLCache(settings.STATS_CACHE_TTL)
+STATS_CACHE_HEADERS = {"Cache-Control": f"public, max-age={settings.STATS_CACHE_TTL}"}
+
+# Rows fetched per round-trip from the server-side cursor when streaming NDJSON
+NDJSON_BATCH_SIZE = 1000
+
+# Montada uma vez no import: o cache de compilação do SQLAlchemy reaproveita o SQL
+EMBEDDING_COUNTS_QUERY = select(
+    func.count().filter(Song.embedding.is_not(None)).label('with_embeddings'),
+    func.count().label('total')
+)
+
+
+def json_etag(content) -> str:
+    """Strong ETag for a pre-serialized JSON body"""
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    return '"' + hashlib.blake2b(content, digest_size=8).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """The client's If-None-Match already names `etag` (its copy is current)"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates or "*" in candidates
+
+
+def cached_json_response(request: Request, content) -> Response:
+    """
+    Response for pre-serialized JSON (bytes or str) kept in stats_cache
+    
+    Answers 304 Not Modified without a body when the client's
+    If-None-Match matches the body's ETag.
+    """
+    etag = json_etag(content)
+    headers = {**STATS_CACHE_HEADERS, "ETag": etag}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="application/json", headers=headers)
+
 
 @router.get("/stats", response_model=StatsResponse)
-async def get_statistics(db: Session = Depends(get_db)):
+async def get_statistics(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Get comprehensive statistics about the music dataset
     
@@ -27,62 +76,89 @@ async def get_statistics(db: Session = Depends(get_db)):
     - Year range of songs
     - Average lyrics length
     """
+    cache_key = ("stats",)
+    cached = stats_cache.get(cache_key)
+    if cached is not None:
+        return cached_json_response(request, cached)
+    
     try:
-        # Basic counts
-        total_songs = db.query(Song).count()
-        total_artists = db.query(Song.artist_name).distinct().count()
+        # Todos os agregados escalares em uma única query (uma ida ao banco) - SEGURO
+        if settings.STATS_USE_MATERIALIZED_VIEWS:
+            totals_query = select(
+                mv_song_stats.c.total_songs,
+                mv_song_stats.c.total_artists,
+                mv_song_stats.c.songs_with_embeddings,
+                mv_song_stats.c.min_year,
+                mv_song_stats.c.max_year,
+                mv_song_stats.c.unique_years,
+                mv_song_stats.c.avg_lyrics_length.label('avg_length')
+            )
+        else:
+            totals_query = select(
+                func.count().label('total_songs'),
+                func.count().filter(Song.embedding.is_not(None)).label('songs_with_embeddings'),
+                # min/max/count(distinct) já ignoram anos NULL
+                func.min(Song.year).label('min_year'),
+                func.max(Song.year).label('max_year'),
+                func.count(func.distinct(Song.year)).label('unique_years'),
+                func.avg(Song.lyrics_len).filter(Song.lyrics_len > 0).label('avg_length')
+            )
+        totals = (await db.execute(totals_query)).first()
         
-        # Embedding statistics (simple version)
-        songs_with_embeddings = db.query(Song).filter(Song.embedding.isnot(None)).count()
+        total_songs = totals.total_songs
+        songs_with_embeddings = totals.songs_with_embeddings
         embedding_coverage = round((songs_with_embeddings / total_songs * 100), 2) if total_songs > 0 else 0
         
         # Top artists usando SQLAlchemy ORM - SEGURO
-        top_artists_query = select(
-            Song.artist_name,
-            func.count().label('song_count')
-        ).group_by(
-            Song.artist_name
-        ).order_by(
-            func.count().desc()
-        ).limit(10)
+        if settings.STATS_USE_MATERIALIZED_VIEWS:
+            top_artists_query = select(
+                mv_artist_stats.c.artist_name,
+                mv_artist_stats.c.song_count
+            ).order_by(
+                mv_artist_stats.c.song_count.desc()
+            ).limit(10)
+        else:
+            # Um único GROUP BY artist_name serve o top 10 e o total de artistas:
+            # count(*) OVER () conta os grupos antes do LIMIT
+            artist_counts = select(
+                Song.artist_name,
+                func.count().label('song_count')
+            ).group_by(
+                Song.artist_name
+            ).cte('artist_counts')
+            top_artists_query = select(
+                artist_counts.c.artist_name,
+                artist_counts.c.song_count,
+                func.count().over().label('total_artists')
+            ).order_by(
+                artist_counts.c.song_count.desc()
+            ).limit(10)
         
-        top_artists_result = db.execute(top_artists_query)
+        top_artists_rows = (await db.execute(top_artists_query)).all()
         
         top_artists = [
             {
                 "artist_name": row.artist_name,
                 "song_count": row.song_count
             }
-            for row in top_artists_result
+            for row in top_artists_rows
         ]
         
-        # Year statistics usando SQLAlchemy ORM - SEGURO
-        year_stats_query = select(
-            func.min(Song.year).label('min_year'),
-            func.max(Song.year).label('max_year'),
-            func.count(func.distinct(Song.year)).label('unique_years')
-        ).where(Song.year.is_not(None))
-        
-        year_stats_result = db.execute(year_stats_query).first()
+        if settings.STATS_USE_MATERIALIZED_VIEWS:
+            total_artists = totals.total_artists
+        else:
+            total_artists = top_artists_rows[0].total_artists if top_artists_rows else 0
         
         year_range = {
-            "min_year": year_stats_result.min_year if year_stats_result.min_year else None,
-            "max_year": year_stats_result.max_year if year_stats_result.max_year else None,
-            "unique_years": year_stats_result.unique_years if year_stats_result.unique_years else 0
+            "min_year": totals.min_year if totals.min_year else None,
+            "max_year": totals.max_year if totals.max_year else None,
+            "unique_years": totals.unique_years if totals.unique_years else 0
         }
         
-        # Average lyrics length usando SQLAlchemy ORM - SEGURO
-        avg_length_query = select(
-            func.avg(func.length(Song.lyrics)).label('avg_length')
-        ).where(
-            Song.lyrics.is_not(None),
-            Song.lyrics != ''
-        )
-        
-        avg_lyrics_result = db.execute(avg_length_query).first()
-        avg_lyrics_length = float(avg_lyrics_result.avg_length) if avg_lyrics_result.avg_length else 0.0
+        avg_lyrics_length = float(totals.avg_length) if totals.avg_length else 0.0
         
-        return StatsResponse(
+        # Validado uma vez e serializado pelo pydantic-core; respostas seguintes saem do cache em bytes
+        content = StatsResponse(
             total_songs=total_songs,
             total_artists=total_artists,
             songs_with_embeddings=songs_with_embeddings,
@@ -90,77 +166,182 @@ async def get_statistics(db: Session = Depends(get_db)):
             top_artists=top_artists,
             year_range=year_range,
             average_lyrics_length=round(avg_lyrics_length, 2) if avg_lyrics_length else 0
-        )
+        ).model_dump_json()
+        stats_cache.set(cache_key, content)
+        return cached_json_response(request, content)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating statistics: {str(e)}")
 
 
-@router.get("/stats/artists")
-async def get_artist_statistics(
-    limit: int = 20,
-    db: Session = Depends(get_db)
-):
+def artist_stats_rows(limit: int):
     """
-    Get detailed statistics for artists
+    Top artists by song count, one row per artist with the averages already rounded
     
-    - **limit**: Maximum number of artists to return
+    Every row also carries total_artists, the number of artists before the limit.
     """
-    try:
-        # Artist statistics usando SQLAlchemy ORM - SEGURO
-        artist_stats_query = select(
+    if settings.STATS_USE_ARTIST_SUMMARY:
+        # Tabela mantida por trigger: leitura indexada por song_count
+        artist_rows = select(
+            artist_summary.c.artist_name,
+            artist_summary.c.song_count,
+            artist_summary.c.earliest_year,
+            artist_summary.c.latest_year,
+            artist_summary.c.avg_lyrics_length,
+            func.count().over().label('total_artists')
+        ).order_by(
+            artist_summary.c.song_count.desc()
+        ).limit(limit)
+    elif settings.STATS_USE_MATERIALIZED_VIEWS:
+        artist_rows = select(
+            mv_artist_stats.c.artist_name,
+            mv_artist_stats.c.song_count,
+            mv_artist_stats.c.earliest_year,
+            mv_artist_stats.c.latest_year,
+            mv_artist_stats.c.avg_lyrics_length,
+            func.count().over().label('total_artists')
+        ).order_by(
+            mv_artist_stats.c.song_count.desc()
+        ).limit(limit)
+    else:
+        artist_rows = select(
             Song.artist_name,
             func.count().label('song_count'),
             func.min(Song.year).label('earliest_year'),
             func.max(Song.year).label('latest_year'),
-            func.avg(func.length(Song.lyrics)).label('avg_lyrics_length')
+            func.avg(Song.lyrics_len).label('avg_lyrics_length'),
+            # Número de artistas antes do LIMIT, no mesmo scan
+            func.count().over().label('total_artists')
         ).where(
-            Song.lyrics.is_not(None),
-            Song.lyrics != ''
+            Song.lyrics_len > 0
         ).group_by(
             Song.artist_name
         ).order_by(
             func.count().desc()
         ).limit(limit)
+    artist_rows = artist_rows.subquery('t')
+    
+    return select(
+        artist_rows.c.artist_name,
+        artist_rows.c.song_count,
+        artist_rows.c.earliest_year,
+        artist_rows.c.latest_year,
+        func.coalesce(func.round(artist_rows.c.avg_lyrics_length, 2), 0).label('avg_lyrics_length'),
+        artist_rows.c.total_artists
+    )
+
+
+def year_stats_rows():
+    """Song and artist counts per year, newest first"""
+    if settings.STATS_USE_MATERIALIZED_VIEWS:
+        return select(mv_year_stats).order_by(mv_year_stats.c.year.desc())
+    return (
+        select(
+            Song.year,
+            func.count().label('song_count'),
+            func.count(func.distinct(Song.artist_name)).label('artist_count')
+        )
+        .where(Song.year.is_not(None))
+        .group_by(Song.year)
+        .order_by(Song.year.desc())
+    )
+
+
+def wants_ndjson(request: Request) -> bool:
+    """Client asked for newline-delimited JSON (one row per line, streamed)"""
+    return "application/x-ndjson" in request.headers.get("accept", "")
+
+
+async def stream_ndjson(statement):
+    """
+    Yield each row of `statement` as an NDJSON line, read through a server-side cursor
+    
+    Uses its own session: the request's session is closed before a
+    StreamingResponse body is consumed.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(statement.execution_options(yield_per=NDJSON_BATCH_SIZE))
+        async for row in result:
+            # Decimal (avg/round) vira float
+            yield orjson.dumps(dict(row._mapping), default=float) + b"\n"
+
+
+@router.get("/stats/artists")
+async def get_artist_statistics(
+    request: Request,
+    limit: int = Query(20, description="Maximum number of artists", ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Get detailed statistics for artists
+    
+    - **limit**: Maximum number of artists to return
+    
+    Send `Accept: application/x-ndjson` to stream one artist per line instead.
+    """
+    if wants_ndjson(request):
+        artist_rows = artist_stats_rows(limit).subquery('a')
+        columns = [column for column in artist_rows.c if column.name != 'total_artists']
+        return StreamingResponse(
+            stream_ndjson(select(*columns).order_by(artist_rows.c.song_count.desc())),
+            media_type="application/x-ndjson"
+        )
+    
+    cache_key = ("artists", limit)
+    cached = stats_cache.get(cache_key)
+    if cached is not None:
+        return cached_json_response(request, cached)
+    
+    try:
+        # Artist statistics usando SQLAlchemy ORM - SEGURO
+        # CTE referenciada duas vezes: o Postgres a materializa, um único GROUP BY
+        artist_rows = artist_stats_rows(limit).cte('artist_rows')
+        artist_json = select(
+            *[column for column in artist_rows.c if column.name != 'total_artists']
+        ).subquery('a')
         
-        result = db.execute(artist_stats_query)
+        # O Postgres monta o JSON final; nenhuma linha passa por Python
+        artist_stats_query = select(
+            func.json_build_object(
+                'artists', func.coalesce(
+                    func.json_agg(aggregate_order_by(
+                        literal_column('a'), artist_json.c.song_count.desc()
+                    )),
+                    literal_column("'[]'::json")
+                ),
+                'total_artists', func.coalesce(
+                    select(func.max(artist_rows.c.total_artists)).scalar_subquery(), 0
+                )
+            ).cast(Text)
+        ).select_from(artist_json)
         
-        artists = []
-        for row in result:
-            artists.append({
-                "artist_name": row.artist_name,
-                "song_count": row.song_count,
-                "earliest_year": row.earliest_year,
-                "latest_year": row.latest_year,
-                "avg_lyrics_length": round(float(row.avg_lyrics_length), 2) if row.avg_lyrics_length else 0
-            })
+        content = (await db.execute(artist_stats_query)).scalar_one()
         
-        return {
-            "artists": artists,
-            "total_artists": len(artists)
-        }
+        stats_cache.set(cache_key, content)
+        return cached_json_response(request, content)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting artist statistics: {str(e)}")
 
 
 @router.get("/stats/years")
-async def get_year_statistics(db: Session = Depends(get_db)):
+async def get_year_statistics(request: Request, db: AsyncSession = Depends(get_async_db)):
     """
     Get statistics by year
+    
+    Send `Accept: application/x-ndjson` to stream one year per line instead.
     """
+    if wants_ndjson(request):
+        return StreamingResponse(stream_ndjson(year_stats_rows()), media_type="application/x-ndjson")
+    
+    cache_key = ("years",)
+    cached = stats_cache.get(cache_key)
+    if cached is not None:
+        return cached_json_response(request, cached)
+    
     try:
         # Use SQLAlchemy ORM instead of raw SQL
-        result = db.execute(
-            select(
-                Song.year,
-                func.count().label('song_count'),
-                func.count(func.distinct(Song.artist_name)).label('artist_count')
-            )
-            .where(Song.year.is_not(None))
-            .group_by(Song.year)
-            .order_by(Song.year.desc())
-        )
+        result = await db.execute(year_stats_rows())
         
         years = []
         for row in result:
@@ -170,41 +351,67 @@ async def get_year_statistics(db: Session = Depends(get_db)):
                 "artist_count": row.artist_count
             })
         
-        return {
+        result = {
             "years": years,
             "total_years": len(years)
         }
+        content = orjson.dumps(result)
+        stats_cache.set(cache_key, content)
+        return cached_json_response(request, content)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting year statistics: {str(e)}")
 
 
 @router.get("/stats/embeddings")
-async def get_embedding_statistics(db: Session = Depends(get_db)):
+async def get_embedding_statistics(
+    request: Request,
+    exact: bool = Query(False, description="Exact COUNT(*) instead of planner estimates"),
+    db: AsyncSession = Depends(get_async_db)
+):
     """
     Get detailed embedding statistics
+    
+    - **exact**: Counts are planner estimates (pg_class.reltuples) unless exact=true
     """
+    cache_key = ("embeddings", exact)
+    cached = stats_cache.get(cache_key)
+    if cached is not None:
+        return cached_json_response(request, cached)
+    
     try:
-        embedding_service = EmbeddingService()
-        stats = embedding_service.get_embedding_statistics(db)
-        
-        # Additional embedding stats using SQLAlchemy ORM
-        result = db.execute(
-            select(
-                func.count(case((Song.embedding.is_not(None), 1))).label('with_embeddings'),
-                func.count(case((Song.embedding.is_(None), 1))).label('without_embeddings'),
-                func.count().label('total')
-            )
-        ).fetchone()
+        total_songs = songs_with_embeddings = None
+        if not exact:
+            # O(1): estimativas do catálogo para a tabela e o índice parcial
+            total_songs = await estimate_row_count_async(db, "songs")
+            songs_with_embeddings = await estimate_row_count_async(db, EMBEDDED_SONGS_INDEX_NAME)
+        
+        if total_songs is None or songs_with_embeddings is None:
+            # Todas as contagens em uma query (sem o par de COUNT(*) do EmbeddingService)
+            result = (await db.execute(EMBEDDING_COUNTS_QUERY)).one()
+            total_songs = result.total
+            songs_with_embeddings = result.with_embeddings
+        
+        songs_with_embeddings = min(songs_with_embeddings, total_songs)
+        songs_without_embeddings = total_songs - songs_with_embeddings
         
-        return {
-            **stats,
+        response_data = {
+            "total_songs": total_songs,
+            "songs_with_embeddings": songs_with_embeddings,
+            "songs_without_embeddings": songs_without_embeddings,
+            "embedding_coverage": round(songs_with_embeddings / total_songs * 100, 2) if total_songs > 0 else 0,
+            "embedding_model": settings.EMBEDDING_MODEL,
+            "embedding_dimensions": settings.EMBEDDING_DIMENSIONS,
+            "exact": exact,
             "detailed_counts": {
-                "with_embeddings": result[0],
-                "without_embeddings": result[1],
-                "total": result[2]
+                "with_embeddings": songs_with_embeddings,
+                "without_embeddings": songs_without_embeddings,
+                "total": total_songs
             }
         }
+        content = orjson.dumps(response_data)
+        stats_cache.set(cache_key, content)
+        return cached_json_response(request, content)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting embedding statistics: {str(e)}")
@@ -2,12 +2,30 @@
 Pydantic schemas for API requests and responses
 """
 
-from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from pydantic import BaseModel, ConfigDict, Field, StringConstraints, field_validator
+from typing import Annotated, List, Optional
 from datetime import datetime
 import re
 
 
+# Consultas por chamada de /search/batch (cada uma conta no rate limit de /search)
+BATCH_SEARCH_MAX_QUERIES = 10
+
+# Search query validation, compiled once at import time
+_FORBIDDEN_QUERY_PATTERNS = re.compile(r'(;|--|/\*|\*/|xp_|sp_|DROP|DELETE|INSERT|UPDATE)', re.IGNORECASE)
+
+# Length and charset are checked by pydantic-core (Rust) before any Python runs
+SearchQuery = Annotated[
+    str,
+    StringConstraints(
+        strip_whitespace=True,
+        min_length=1,
+        max_length=100,
+        pattern=r'^[a-zA-Z0-9\s\-\'\".,!?()&]+$'
+    )
+]
+
+
 class SongBase(BaseModel):
     """
     Base song schema with essential music metadata
@@ -67,9 +85,9 @@ class SongResponse(SongBase):
         description="ID único da música no sistema",
         example=1
     )
-    lyrics: str = Field(
-        ..., 
-        description="Letra completa da música",
+    lyrics: Optional[str] = Field(
+        None, 
+        description="Letra completa da música (omitida quando include_lyrics=false)",
         example="The club isn't the best place to find a lover..."
     )
     created_at: Optional[datetime] = Field(
@@ -77,9 +95,9 @@ class SongResponse(SongBase):
         description="Timestamp de quando a música foi adicionada ao sistema"
     )
     
-    class Config:
-        from_attributes = True
-        json_schema_extra = {
+    model_config = ConfigDict(
+        from_attributes=True,
+        json_schema_extra={
             "example": {
                 "id": 1,
                 "track_name": "Shape of You",
@@ -91,11 +109,16 @@ class SongResponse(SongBase):
                 "created_at": "2024-08-03T10:30:00Z"
             }
         }
+    )
     
     @classmethod
-    def from_orm(cls, obj):
-        """Compatibility method for Pydantic v2"""
-        return cls.model_validate(obj)
+    def from_orm(cls, obj, include_lyrics: bool = True):
+        """Compatibility method for Pydantic v2 (lyrics are not read when include_lyrics is False)"""
+        if include_lyrics:
+            return cls.model_validate(obj)
+        return cls.model_validate({
+            field: getattr(obj, field) for field in cls.model_fields if field != "lyrics"
+        })
 
 
 class SongSearchResult(BaseModel):
@@ -116,8 +139,8 @@ class SongSearchResult(BaseModel):
         le=1.0
     )
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "song": {
                     "id": 1,
@@ -130,6 +153,7 @@ class SongSearchResult(BaseModel):
                 "similarity": 0.85
             }
         }
+    )
 
 
 class SearchRequest(BaseModel):
@@ -138,11 +162,9 @@ class SearchRequest(BaseModel):
     
     Use natural language to describe the mood, theme, or feeling you're looking for
     """
-    query: str = Field(
+    query: SearchQuery = Field(
         ..., 
         description="Consulta em linguagem natural descrevendo o que você procura",
-        min_length=1, 
-        max_length=100,
         example="nostalgia and lost love"
     )
     limit: Optional[int] = Field(
@@ -159,34 +181,29 @@ class SearchRequest(BaseModel):
         le=1.0,
         example=0.3
     )
+    include_lyrics: bool = Field(
+        True,
+        description="Incluir a letra completa de cada música nos resultados"
+    )
     
-    class Config:
-        json_schema_extra = {
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "query": "nostalgia and lost love",
                 "limit": 10,
                 "similarity_threshold": 0.3
             }
         }
+    )
     
-    @validator('query')
-    def validate_query(cls, v):
-        """Validate search query for security"""
-        if not v or not v.strip():
-            raise ValueError('Query cannot be empty')
-        
-        # Remove potential SQL injection patterns
-        dangerous_patterns = [';', '--', '/*', '*/', 'xp_', 'sp_', 'DROP', 'DELETE', 'INSERT', 'UPDATE']
-        query_upper = v.upper()
-        for pattern in dangerous_patterns:
-            if pattern in query_upper:
-                raise ValueError(f'Query contains forbidden pattern: {pattern}')
-        
-        # Allow only safe characters
-        if not re.match(r'^[a-zA-Z0-9\s\-\'\".,!?()&]+$', v):
-            raise ValueError('Query contains invalid characters')
-            
-        return v.strip()
+    @field_validator('query', mode='after')
+    @classmethod
+    def validate_query(cls, v: str) -> str:
+        """Reject SQL injection patterns (length and charset are enforced by SearchQuery)"""
+        forbidden = _FORBIDDEN_QUERY_PATTERNS.search(v)
+        if forbidden:
+            raise ValueError(f'Query contains forbidden pattern: {forbidden.group().upper()}')
+        return v
 
 
 class SearchResponse(BaseModel):
@@ -208,6 +225,40 @@ class SearchResponse(BaseModel):
     processing_time_ms: float = Field(..., description="Processing time in milliseconds")
 
 
+class BatchSearchRequest(BaseModel):
+    """
+    Several semantic searches in one request (e.g. multi-facet search UIs)
+    
+    Every query shares the same limit, threshold and lyrics options
+    """
+    queries: List[SearchQuery] = Field(
+        ...,
+        description="Consultas em linguagem natural (1-10)",
+        min_length=1,
+        max_length=BATCH_SEARCH_MAX_QUERIES,
+        example=["nostalgia and lost love", "party vibes and celebration"]
+    )
+    limit: Optional[int] = Field(10, description="Número máximo de resultados por consulta (1-20)", ge=1, le=20)
+    similarity_threshold: Optional[float] = Field(0.0, description="Score mínimo de similaridade", ge=0.0, le=1.0)
+    include_lyrics: bool = Field(True, description="Incluir a letra completa de cada música nos resultados")
+    
+    @field_validator('queries', mode='after')
+    @classmethod
+    def validate_queries(cls, v: List[str]) -> List[str]:
+        """Reject SQL injection patterns in any of the queries"""
+        for query in v:
+            forbidden = _FORBIDDEN_QUERY_PATTERNS.search(query)
+            if forbidden:
+                raise ValueError(f'Query contains forbidden pattern: {forbidden.group().upper()}')
+        return v
+
+
+class BatchSearchResponse(BaseModel):
+    """One search response per query, in request order"""
+    results: List[SearchResponse] = Field(..., description="Resultados de cada consulta, na ordem do pedido")
+    processing_time_ms: float = Field(..., description="Processing time in milliseconds")
+
+
 class StatsResponse(BaseModel):
     """Schema for statistics responses"""
     total_songs: int = Field(..., description="Total number of songs")
@@ -226,9 +277,8 @@ class ErrorResponse(BaseModel):
 
 
 class PaginatedResponse(BaseModel):
-    """Schema for paginated responses"""
+    """Schema for cursor-paginated responses"""
     items: List[SongResponse] = Field(..., description="List of items")
-    total: int = Field(..., description="Total number of items")
-    page: int = Field(..., description="Current page number")
+    total: Optional[int] = Field(None, description="Approximate total number of items (unfiltered listings only)")
     per_page: int = Field(..., description="Items per page")
-    total_pages: int = Field(..., description="Total number of pages")
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page (null on the last page)")
@@ -3,9 +3,14 @@ Database configuration and connection management for MusicSeeker
 """
 
 import logging
-from sqlalchemy import create_engine, text, inspect
+import psycopg
+from pgvector.psycopg import HalfVector, register_vector_async
+from pgvector.psycopg.halfvec import HalfVectorDumper
+from pgvector.sqlalchemy import HALFVEC
+from sqlalchemy import create_engine, event, text, inspect
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.exc import ProgrammingError, OperationalError
 from app.config import settings
 
@@ -15,31 +20,116 @@ logger = logging.getLogger(__name__)
 # Database URL from settings
 DATABASE_URL = settings.DATABASE_URL
 
+# Pool sized for concurrent requests; recycled before managed-database idle timeouts
+POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
+
 # Create SQLAlchemy engine
-engine = create_engine(DATABASE_URL, echo=settings.DEBUG)
+engine = create_engine(DATABASE_URL, echo=settings.DEBUG, **POOL_OPTIONS)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async read-only engine (psycopg 3 speaks asyncio natively) for the API read
+# endpoints (songs, search, stats), so queries never block the event loop.
+# Points at DATABASE_READ_URL (a replica) when set; read-only transactions and a
+# statement timeout keep dashboard aggregates from affecting the write path.
+async_engine = create_async_engine(
+    settings.DATABASE_READ_URL,
+    echo=settings.DEBUG,
+    connect_args={
+        "options": f"-c default_transaction_read_only=on -c statement_timeout={settings.DB_READ_STATEMENT_TIMEOUT_MS}"
+    },
+    **POOL_OPTIONS
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+# Fallback: HalfVector em texto (tipo resolvido pelo servidor) em conexões
+# onde os adapters binários do pgvector não puderam ser registrados
+psycopg.adapters.register_dumper(HalfVector, HalfVectorDumper)
+
+
+@event.listens_for(async_engine.sync_engine, "connect")
+def register_pgvector_adapters(dbapi_connection, connection_record):
+    """Register the pgvector types on each new read connection (binary halfvec transfer)"""
+    try:
+        dbapi_connection.run_async(register_vector_async)
+    except Exception as e:
+        logger.warning(f"pgvector binary adapters not registered, using text format: {e}")
+
+
+class HalfVecParam(HALFVEC):
+    """
+    HALFVEC bind parameter handed to psycopg as a HalfVector
+
+    On connections with the pgvector adapters registered the vector travels in
+    the binary wire format (2 bytes per dimension) instead of a formatted
+    '[0.0123,...]' string built float by float on every query.
+    """
+
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        def process(value):
+            if value is None or isinstance(value, HalfVector):
+                return value
+            return HalfVector(value)
+        return process
+
 # Create Base class for models
 Base = declarative_base()
 
 
-def get_db():
+async def get_async_db():
     """
-    Dependency to get database session
+    Dependency to get an async, read-only database session
     """
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+# Connectivity probe, built once so SQLAlchemy's compiled cache is always hit
+HEALTH_CHECK_QUERY = text("SELECT 1")
+
+# Planner row estimate for a table or index: an O(1) catalog lookup instead of COUNT(*)
+RELTUPLES_QUERY = text("SELECT reltuples::bigint FROM pg_class WHERE relname = :relname")
+
+
+def _valid_estimate(estimate):
+    # reltuples is -1 until the relation has been vacuumed/analyzed
+    return estimate if estimate is not None and estimate >= 0 else None
+
+
+def estimate_row_count(db, relname: str):
+    """
+    Approximate row count of a table or (partial) index from pg_class.reltuples
+    
+    Returns None when no estimate is available yet
+    """
+    return _valid_estimate(db.execute(RELTUPLES_QUERY, {"relname": relname}).scalar())
+
+
+async def estimate_row_count_async(db, relname: str):
+    """Async variant of estimate_row_count for AsyncSession"""
+    return _valid_estimate((await db.execute(RELTUPLES_QUERY, {"relname": relname})).scalar())
+
+
+# Tabelas confirmadas/criadas neste processo: não repetir as queries de catálogo
+_tables_ready = False
 
 
 def check_tables_exist():
     """
     Check if required tables already exist
     """
+    global _tables_ready
+    if _tables_ready:
+        return True
     try:
         inspector = inspect(engine)
         existing_tables = inspector.get_table_names()
@@ -51,6 +141,7 @@ def check_tables_exist():
                 return False
         
         logger.info("All required tables exist")
+        _tables_ready = True
         return True
     except Exception as e:
         logger.warning(f"Error checking tables: {e}")
@@ -61,6 +152,7 @@ def create_tables():
     """
     Create all tables in the database with proper error handling
     """
+    global _tables_ready
     try:
         # First check if tables already exist
         if check_tables_exist():
@@ -70,6 +162,7 @@ def create_tables():
         logger.info("Creating database tables...")
         Base.metadata.create_all(bind=engine)
         logger.info("Tables created successfully")
+        _tables_ready = True
         return True
         
     except ProgrammingError as e:
@@ -96,7 +189,7 @@ def test_database_connection():
     """
     try:
         with engine.connect() as conn:
-            result = conn.execute(text("SELECT 1"))
+            conn.execute(HEALTH_CHECK_QUERY)
             logger.info("Database connection successful")
             return True
     except Exception as e:
@@ -0,0 +1,36 @@
+"""
+Periodic refresh of the statistics materialized views
+"""
+
+import asyncio
+import logging
+
+from sqlalchemy import text
+
+from app.db.database import engine
+from app.models.stats_views import STATS_VIEWS
+
+logger = logging.getLogger(__name__)
+
+
+def refresh_stats_views() -> None:
+    """
+    Refresh every stats materialized view without blocking readers
+
+    REFRESH ... CONCURRENTLY cannot run inside a transaction block, so this
+    uses an AUTOCOMMIT connection (blocking; run it in a worker thread).
+    """
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for view in STATS_VIEWS:
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"))
+    logger.info("Stats materialized views refreshed")
+
+
+async def refresh_stats_views_periodically(interval_seconds: int) -> None:
+    """Refresh the stats views every `interval_seconds` until cancelled"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(refresh_stats_views)
+        except Exception as e:
+            logger.warning(f"Stats materialized views refresh failed: {e}")
@@ -2,39 +2,84 @@
 Main FastAPI application for MusicSeeker
 """
 
+import asyncio
 import logging
+import time
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.exc import OperationalError
+from typing import Optional, Tuple
+import orjson
 import uvicorn
 import os
 
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
 from app.config import settings
-from app.db.database import get_db, create_tables, test_database_connection
+from app.db.database import engine, HEALTH_CHECK_QUERY, create_tables, test_database_connection, SessionLocal, async_engine
+from app.db.refresh import refresh_stats_views_periodically
 from app.api.routes import songs, search, stats
-from app.middleware.security import SecurityMiddleware, add_process_time_header, limit_request_size
+from app.services.embedding_service import tune_hnsw_index, get_embedding_service, close_embedding_service
+from app.services.vector_index import vector_index, reload_vector_index, refresh_vector_index_periodically
+from app.services.search_cache import shared_search_cache
+from app.middleware.rate_limit import limiter
+from app.middleware.security import SecurityMiddleware
 from app.utils.logging import setup_logging
 
 # Setup logger
 logger = logging.getLogger(__name__)
 
 
+# Schema OpenAPI gerado no build (scripts/export_openapi.py)
+OPENAPI_SCHEMA_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "openapi.json")
+
+
+def load_prebuilt_openapi(app: FastAPI) -> bool:
+    """
+    Use the OpenAPI schema exported at build time instead of generating it
+    
+    The file is ignored when missing, unreadable or built for another APP_VERSION.
+    
+    Returns:
+        True when the prebuilt schema was loaded
+    """
+    if not os.path.isfile(OPENAPI_SCHEMA_FILE):
+        return False
+    try:
+        with open(OPENAPI_SCHEMA_FILE, "rb") as f:
+            schema = orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError) as e:
+        logger.warning(f"Ignoring prebuilt OpenAPI schema: {e}")
+        return False
+    if schema.get("info", {}).get("version") != settings.APP_VERSION:
+        logger.warning("Ignoring prebuilt OpenAPI schema built for another version")
+        return False
+    app.openapi_schema = schema
+    return True
+
+
+def _tune_hnsw_params() -> dict:
+    """Apply the corpus-sized HNSW search parameters (blocking; run it in a worker thread)"""
+    with SessionLocal() as db:
+        return tune_hnsw_index(db)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan events for FastAPI application"""
     # Startup
     setup_logging()  # Initialize secure logging
     
-    # Test database connection
-    if not test_database_connection():
+    if load_prebuilt_openapi(app):
+        logger.info("Loaded prebuilt OpenAPI schema")
+    
+    # Probe explícito só em DEBUG: create_tables já abre a primeira conexão
+    # e levanta OperationalError se o banco estiver inacessível
+    if settings.DEBUG and not test_database_connection():
         logger.error("Failed to connect to database during startup")
         raise Exception("Database connection failed")
     
@@ -42,16 +87,53 @@ async def lifespan(app: FastAPI):
     try:
         create_tables()
         logger.info("Database initialization completed")
+    except OperationalError as e:
+        logger.error("Failed to connect to database during startup")
+        raise Exception("Database connection failed") from e
     except Exception as e:
         logger.error(f"Database initialization failed: {e}")
         # Don't raise here - let the app continue if tables might exist
+    
+    # Create the shared embedding service (and its HTTP client) before the first request
+    get_embedding_service()
+    
+    # Size ef_search to the current corpus (index rebuilds: scripts/tune_hnsw_index.py)
+    try:
+        hnsw_params = await asyncio.to_thread(_tune_hnsw_params)
+        logger.info(f"HNSW parameters: {hnsw_params}")
+    except Exception as e:
+        logger.warning(f"HNSW auto-tuning skipped: {e}")
+    
+    # Backend em processo (memory/hnswlib): carregar os embeddings na subida
+    refresh_task = None
+    if vector_index is not None:
+        try:
+            await asyncio.to_thread(reload_vector_index, vector_index)
+        except Exception as e:
+            logger.warning(f"In-process vector index not loaded, falling back to pgvector: {e}")
+        if settings.VECTOR_INDEX_REFRESH_SECONDS > 0:
+            refresh_task = asyncio.create_task(
+                refresh_vector_index_periodically(vector_index, settings.VECTOR_INDEX_REFRESH_SECONDS)
+            )
+    
+    # Materialized views do /stats: atualizar em background
+    stats_refresh_task = None
+    if settings.STATS_USE_MATERIALIZED_VIEWS and settings.STATS_MV_REFRESH_SECONDS > 0:
+        stats_refresh_task = asyncio.create_task(
+            refresh_stats_views_periodically(settings.STATS_MV_REFRESH_SECONDS)
+        )
         
     yield
-    # Shutdown (if needed)
-
+    # Shutdown
+    if refresh_task is not None:
+        refresh_task.cancel()
+    if stats_refresh_task is not None:
+        stats_refresh_task.cancel()
+    await close_embedding_service()
+    if shared_search_cache is not None:
+        await shared_search_cache.aclose()
+    await async_engine.dispose()
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
 
 # Create FastAPI application
 app = FastAPI(
@@ -132,6 +214,7 @@ Busque músicas usando **inteligência artificial** e **similaridade semântica*
             "description": "Endpoints de sistema e health checks",
         }
     ],
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -139,35 +222,40 @@ Busque músicas usando **inteligência artificial** e **similaridade semântica*
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-# Add CORS middleware - CONFIGURAÇÃO DINÂMICA
-cors_origins = settings.CORS_ORIGINS if settings.ENVIRONMENT == "production" else [
-    "http://localhost:3000", 
-    "http://localhost:8080", 
-    "http://localhost:8000"
-]
-
+# Add CORS middleware - origens resolvidas uma vez em Settings.CORS_ORIGINS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=cors_origins,
+    allow_origins=settings.CORS_ORIGINS,
+    allow_origin_regex=settings.CORS_ORIGIN_REGEX,
     allow_credentials=True,
     allow_methods=["GET", "POST"],
     allow_headers=["*"],
 )
 
 # Add security middleware
-app.middleware("http")(limit_request_size)
-app.middleware("http")(add_process_time_header)
 app.add_middleware(SecurityMiddleware)
 
 # Mount static files
 static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
-if os.path.exists(static_dir):
-    app.mount("/static", StaticFiles(directory=static_dir), name="static")
-else:
+if not os.path.exists(static_dir):
     # Alternative path for Docker container
     static_dir = "/app/static"
-    if os.path.exists(static_dir):
-        app.mount("/static", StaticFiles(directory=static_dir), name="static")
+
+# Também serve as páginas abaixo: ETag/Last-Modified e 304 para revalidações do navegador
+static_files = StaticFiles(directory=static_dir, check_dir=False)
+if os.path.exists(static_dir):
+    app.mount("/static", static_files, name="static")
+
+
+def _static_file(name: str) -> Optional[Tuple[str, os.stat_result]]:
+    """Path and stat of a file in the static directory, or None when it isn't shipped"""
+    path = os.path.join(static_dir, name)
+    return (path, os.stat(path)) if os.path.isfile(path) else None
+
+
+# Os arquivos não mudam em runtime: resolvidos (e stat'ados) uma vez, sem syscalls por request
+INDEX_FILE = _static_file("index.html")
+DEBUG_FILE = _static_file("debug.html")
 
 # Include API routes
 app.include_router(search.router, prefix="/api/v1", tags=["🔍 Busca Semântica"])
@@ -177,77 +265,79 @@ app.include_router(stats.router, prefix="/api/v1", tags=["📊 Estatísticas"])
 
 # Serve the web interface
 @app.get("/search", tags=["🏠 Sistema"], summary="🔍 Interface de Busca Web")
-async def search_interface():
+async def search_interface(request: Request):
     """Interface web para busca semântica de músicas"""
-    # Try local development path first
-    static_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "index.html")
-    if not os.path.exists(static_file):
-        # Try Docker container path
-        static_file = "/app/static/index.html"
-    
-    if os.path.exists(static_file):
-        return FileResponse(static_file)
+    if INDEX_FILE:
+        return static_files.file_response(*INDEX_FILE, request.scope)
     else:
         raise HTTPException(status_code=404, detail="Interface web não encontrada")
 
 
 @app.get("/debug", tags=["🏠 Sistema"], summary="🐛 Interface de Debug")
-async def debug_interface():
+async def debug_interface(request: Request):
     """Interface de debug para testar a API"""
-    # Try local development path first
-    debug_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "debug.html")
-    if not os.path.exists(debug_file):
-        # Try Docker container path
-        debug_file = "/app/static/debug.html"
-    
-    if os.path.exists(debug_file):
-        return FileResponse(debug_file)
+    if DEBUG_FILE:
+        return static_files.file_response(*DEBUG_FILE, request.scope)
     else:
         raise HTTPException(status_code=404, detail="Interface de debug não encontrada")
 
 
+# Resposta JSON do "/" sem interface web: constante, serializada uma vez
+ROOT_INFO_JSON = orjson.dumps({
+    "message": "Welcome to MusicSeeker API! 🎵",
+    "description": "Semantic music search using OpenAI embeddings",
+    "version": settings.APP_VERSION,
+    "web_interface": "/search",
+    "docs": "/docs",
+    "redoc": "/redoc",
+    "endpoints": {
+        "songs": "/api/v1/songs",
+        "search": "/api/v1/search", 
+        "stats": "/api/v1/stats"
+    }
+})
+
+
 @app.get("/", tags=["🏠 Sistema"], summary="🏠 Interface Web Principal")
-async def root():
+async def root(request: Request):
     """
     Interface web principal do MusicSeeker - busca semântica de músicas
     """
-    # Try local development path first
-    static_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "index.html")
-    if not os.path.exists(static_file):
-        # Try Docker container path
-        static_file = "/app/static/index.html"
-    
-    if os.path.exists(static_file):
-        return FileResponse(static_file)
+    if INDEX_FILE:
+        return static_files.file_response(*INDEX_FILE, request.scope)
     else:
         # Fallback to API info if static files not found
-        return {
-            "message": "Welcome to MusicSeeker API! 🎵",
-            "description": "Semantic music search using OpenAI embeddings",
-            "version": settings.APP_VERSION,
-            "web_interface": "/search",
-            "docs": "/docs",
-            "redoc": "/redoc",
-            "endpoints": {
-                "songs": "/api/v1/songs",
-                "search": "/api/v1/search", 
-                "stats": "/api/v1/stats"
-            }
-        }
+        return Response(content=ROOT_INFO_JSON, media_type="application/json")
+
+
+# Load balancers probe /health every few seconds: the database check is reused for this long
+HEALTH_DB_CHECK_TTL = 5.0  # seconds
+_last_db_ok: float = float("-inf")
+
+
+def _ping_database() -> None:
+    """Round-trip to the database (blocking; run it in a worker thread)"""
+    with engine.connect() as connection:
+        connection.execute(HEALTH_CHECK_QUERY)
 
 
 @app.get("/health", tags=["Health"])
-async def health_check(db: Session = Depends(get_db)):
+async def health_check():
     """
     Health check endpoint
+    
+    The database is only queried when the last successful check is older
+    than HEALTH_DB_CHECK_TTL seconds.
     """
+    global _last_db_ok
     try:
-        # Test database connection using SQLAlchemy ORM
-        from sqlalchemy import select, literal
-        result = db.execute(select(literal(1)))
+        if time.monotonic() - _last_db_ok >= HEALTH_DB_CHECK_TTL:
+            await asyncio.to_thread(_ping_database)
+            _last_db_ok = time.monotonic()
         return {
             "status": "healthy",
             "database": "connected",
+            "pool": engine.pool.status(),
             "timestamp": "2025-08-03T18:00:00Z"
         }
     except Exception as e:
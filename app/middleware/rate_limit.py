@@ -0,0 +1,36 @@
+"""
+Rate limiting for MusicSeeker API
+"""
+
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+from starlette.requests import Request
+
+from app.api.schemas import BATCH_SEARCH_MAX_QUERIES
+from app.config import settings
+
+# Orçamento de buscas por IP, compartilhado por /search e /search/batch
+SEARCH_RATE_LIMIT = "10/minute"
+SEARCH_RATE_LIMIT_SCOPE = "search"
+
+# Instância única do limiter: registrada em app.state e usada nos decorators das rotas
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,
+    strategy=settings.RATE_LIMIT_STRATEGY
+)
+
+
+def batch_search_cost(request: Request) -> int:
+    """
+    Searches charged for a /search/batch call: one per query
+    
+    FastAPI has already parsed the body when the limit is checked (the
+    decoded JSON is cached on the request); if it is not there, the call
+    is charged the maximum batch size.
+    """
+    body = getattr(request, "_json", None)
+    queries = body.get("queries") if isinstance(body, dict) else None
+    if isinstance(queries, list) and queries:
+        return min(len(queries), BATCH_SEARCH_MAX_QUERIES)
+    return BATCH_SEARCH_MAX_QUERIES
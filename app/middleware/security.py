@@ -2,97 +2,120 @@
 Security middleware for MusicSeeker API
 """
 
-from fastapi import Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+import re
 import time
 import logging
-from typing import Callable
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import URL, Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 # Configure security logger
 security_logger = logging.getLogger("security")
 security_logger.setLevel(logging.INFO)
 
+# Common attack patterns in URLs and scanner User-Agents
+SUSPICIOUS_PATTERNS = [
+    "../", "etc/passwd", "cmd.exe", "powershell",
+    "script>", "javascript:", "eval(", "union select",
+    "drop table", "exec(", "<iframe"
+]
+BOT_PATTERNS = ["sqlmap", "nikto", "nmap", "masscan", "zap"]
 
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Middleware para adicionar headers de segurança e logging"""
+# Static assets, docs and probes are not inspected
+UNCHECKED_PATH_PREFIXES = ("/static/", "/docs", "/redoc", "/openapi.json", "/health")
+
+# Compilados uma vez: cada requisição faz uma única varredura por alternação
+_SUSPICIOUS_URL_RE = re.compile("|".join(map(re.escape, SUSPICIOUS_PATTERNS)), re.IGNORECASE)
+# Query string is scanned as the raw bytes from the ASGI scope (no decode/copy)
+_SUSPICIOUS_QUERY_RE = re.compile(
+    b"|".join(re.escape(pattern.encode()) for pattern in SUSPICIOUS_PATTERNS), re.IGNORECASE
+)
+_BOT_USER_AGENT_RE = re.compile("|".join(map(re.escape, BOT_PATTERNS)), re.IGNORECASE)
+
+
+# Limit to 1MB
+MAX_REQUEST_SIZE = 1024 * 1024
+
+# CSP mais permissivo para Swagger UI e interface web funcionarem
+CSP_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com; "
+    "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com https://fonts.gstatic.com; "
+    "img-src 'self' data: https://fastapi.tiangolo.com; "
+    "font-src 'self' https://cdn.jsdelivr.net https://fonts.googleapis.com https://fonts.gstatic.com; "
+    "connect-src 'self'"
+)
+
+# Security headers already in ASGI form (lowercase name, latin-1 bytes): one list splice per response
+SECURITY_HEADERS = [
+    (b"x-frame-options", b"DENY"),
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+    (b"content-security-policy", CSP_POLICY.encode("latin-1")),
+]
+
+
+class SecurityMiddleware:
+    """
+    Middleware para headers de segurança, logging, limite de tamanho e tempo de processamento
     
-    async def dispatch(self, request: Request, call_next):
+    ASGI puro: sem o task group e o Request reconstruído do BaseHTTPMiddleware;
+    os headers são injetados na mensagem http.response.start.
+    """
+    
+    def __init__(self, app: ASGIApp):
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        start_ns = time.perf_counter_ns()  # monotônico, sem floats até o fim
+        request_headers = Headers(scope=scope)
+        
         # Log suspicious patterns
-        if self._is_suspicious_request(request):
+        if self._is_suspicious_request(scope, request_headers):
+            client_host = scope["client"][0] if scope.get("client") else "unknown"
             security_logger.warning(
-                f"Suspicious request from {request.client.host}: {request.url}"
+                f"Suspicious request from {client_host}: {URL(scope=scope)}"
             )
         
-        # Process request
-        response = await call_next(request)
-        
-        # Add security headers
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # Add security headers + tempo em segundos com precisão de microssegundo
+                headers = list(message.get("headers", ()))
+                headers.extend(SECURITY_HEADERS)
+                process_time = format((time.perf_counter_ns() - start_ns) / 1e9, ".6f")
+                headers.append((b"x-process-time", process_time.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
         
-        # CSP mais permissivo para Swagger UI e interface web funcionarem
-        csp_policy = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com; "
-            "style-src 'self' 'unsafe-inline' https://cdn.jsdelivr.net https://fonts.googleapis.com https://fonts.gstatic.com; "
-            "img-src 'self' data: https://fastapi.tiangolo.com; "
-            "font-src 'self' https://cdn.jsdelivr.net https://fonts.googleapis.com https://fonts.gstatic.com; "
-            "connect-src 'self'"
-        )
-        response.headers["Content-Security-Policy"] = csp_policy
+        # Limitar tamanho de requisições
+        content_length = request_headers.get("content-length")
+        if content_length and int(content_length) > MAX_REQUEST_SIZE:
+            response = ORJSONResponse(
+                status_code=413,
+                content={"error": "Request too large"}
+            )
+            await response(scope, receive, send_with_headers)
+            return
         
-        return response
+        # Process request
+        await self.app(scope, receive, send_with_headers)
     
-    def _is_suspicious_request(self, request: Request) -> bool:
+    def _is_suspicious_request(self, scope: Scope, headers: Headers) -> bool:
         """Detecta padrões suspeitos na requisição"""
         
-        # Check for common attack patterns in URL
-        suspicious_patterns = [
-            "../", "etc/passwd", "cmd.exe", "powershell",
-            "script>", "javascript:", "eval(", "union select",
-            "drop table", "exec(", "<iframe"
-        ]
+        path = scope["path"]
+        if path.startswith(UNCHECKED_PATH_PREFIXES):
+            return False
         
-        url_str = str(request.url).lower()
-        for pattern in suspicious_patterns:
-            if pattern in url_str:
-                return True
+        # Check for common attack patterns in URL (path + raw query, without building the URL)
+        if _SUSPICIOUS_URL_RE.search(path) or _SUSPICIOUS_QUERY_RE.search(scope.get("query_string", b"")):
+            return True
         
         # Check User-Agent for common bot patterns
-        user_agent = request.headers.get("user-agent", "").lower()
-        bot_patterns = ["sqlmap", "nikto", "nmap", "masscan", "zap"]
-        
-        for pattern in bot_patterns:
-            if pattern in user_agent:
-                return True
-        
-        return False
-
-
-async def add_process_time_header(request: Request, call_next: Callable):
-    """Middleware para adicionar tempo de processamento"""
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
-
-async def limit_request_size(request: Request, call_next: Callable):
-    """Middleware para limitar tamanho de requisições"""
-    content_length = request.headers.get("content-length")
-    
-    if content_length:
-        content_length = int(content_length)
-        # Limit to 1MB
-        if content_length > 1024 * 1024:
-            return JSONResponse(
-                status_code=413,
-                content={"error": "Request too large"}
-            )
-    
-    response = await call_next(request)
-    return response
+        user_agent = headers.get("user-agent", "")
+        return _BOT_USER_AGENT_RE.search(user_agent) is not None
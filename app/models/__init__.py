@@ -1,4 +1,6 @@
 # Models package
-from .song import Song
+from .song import Song, song_load_options
+from .stats_views import mv_song_stats, mv_artist_stats, mv_year_stats, artist_summary
 
-__all__ = ["Song"]
+__all__ = ["Song", "song_load_options", "mv_song_stats", "mv_artist_stats", "mv_year_stats",
+           "artist_summary"]
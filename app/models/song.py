@@ -2,11 +2,25 @@
 SQLAlchemy models for MusicSeeker application
 """
 
-from sqlalchemy import Column, Integer, String, Text, DateTime
+from sqlalchemy import CheckConstraint, Column, Computed, Integer, String, Text, DateTime, Index, cast, text
+from sqlalchemy.orm import load_only
 from sqlalchemy.sql import func
-from pgvector.sqlalchemy import Vector
+from pgvector.sqlalchemy import BIT, HALFVEC
+from app.config import settings
 from app.db.database import Base
 
+# text-embedding-3-small is Matryoshka-trained: 1536 by default, 512 keeps most of the
+# recall at a third of the size (see scripts/migrations/010_songs_embedding_shrink.sql)
+EMBEDDING_DIMENSIONS = settings.EMBEDDING_DIMENSIONS
+
+# Build parameters of both HNSW indexes; create_tables.sql and the migrations use the same values
+HNSW_BUILD_PARAMS = {"m": 24, "ef_construction": 128}
+
+
+def binary_quantized(embedding):
+    """binary_quantize(embedding)::bit(dims): one bit per dimension (sign), the key of the Hamming index"""
+    return cast(func.binary_quantize(embedding), BIT(EMBEDDING_DIMENSIONS))
+
 
 class Song(Base):
     """
@@ -22,10 +36,78 @@ class Song(Base):
     date = Column(String(50), nullable=True)
     lyrics = Column(Text, nullable=False)
     full_text = Column(Text, nullable=False)  # Combined: track_name + artist_name + lyrics
-    embedding = Column(Vector(1536), nullable=True)  # OpenAI text-embedding-3-small dimensions
+    lyrics_len = Column(Integer, Computed("length(lyrics)", persisted=True))  # Stored, so stats never detoast lyrics
+    embedding = Column(HALFVEC(EMBEDDING_DIMENSIONS), nullable=True)  # EMBEDDING_DIMENSIONS float16 values
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # Unit-length embeddings: inner product == cosine similarity (see scripts/migrations/008_songs_embedding_inner_product.sql)
+        CheckConstraint(
+            "embedding IS NULL OR abs(l2_norm(embedding) - 1) < 0.01",
+            name="ck_songs_embedding_unit_norm",
+        ),
+        # HNSW index for inner-product similarity search (see scripts/migrations/001 and 008)
+        Index(
+            "idx_songs_embedding_hnsw",
+            "embedding",
+            postgresql_using="hnsw",
+            postgresql_with=HNSW_BUILD_PARAMS,
+            postgresql_ops={"embedding": "halfvec_ip_ops"},
+        ),
+        # HNSW over the binary-quantized embeddings (192 bytes per vector) for the
+        # Hamming prefilter (see scripts/migrations/009_songs_embedding_binary_hnsw.sql)
+        Index(
+            "idx_songs_embedding_bit_hnsw",
+            binary_quantized(embedding).label("embedding_bit"),
+            postgresql_using="hnsw",
+            postgresql_with=HNSW_BUILD_PARAMS,
+            postgresql_ops={"embedding_bit": "bit_hamming_ops"},
+        ),
+        # Trigram / full-text indexes for the /songs filters (see scripts/migrations/003_songs_text_search_indexes.sql)
+        Index(
+            "idx_songs_artist_name_trgm",
+            "artist_name",
+            postgresql_using="gin",
+            postgresql_ops={"artist_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "idx_songs_track_name_trgm",
+            "track_name",
+            postgresql_using="gin",
+            postgresql_ops={"track_name": "gin_trgm_ops"},
+        ),
+        Index(
+            "idx_songs_lyrics_fts",
+            text("to_tsvector('simple', lyrics)"),
+            postgresql_using="gin",
+        ),
+        # Aggregate indexes for the /stats endpoints (see scripts/migrations/005 and 006)
+        Index(
+            "idx_songs_year_artist_name",
+            "year",
+            "artist_name",
+            postgresql_where=text("year IS NOT NULL"),
+        ),
+        Index(
+            "idx_songs_id_with_embedding",
+            "id",
+            postgresql_where=text("embedding IS NOT NULL"),
+        ),
+        # Keyset pages of songs still to embed (scripts/generate_embeddings.py)
+        Index(
+            "idx_songs_id_without_embedding",
+            "id",
+            postgresql_where=text("embedding IS NULL"),
+        ),
+        Index(
+            "idx_songs_artist_name_stats",
+            "artist_name",
+            postgresql_include=["year", "lyrics_len"],
+            postgresql_where=text("lyrics_len > 0"),
+        ),
+    )
+
     def __repr__(self):
         return f"<Song(id={self.id}, track='{self.track_name}', artist='{self.artist_name}')>"
 
@@ -43,3 +125,21 @@ class Song(Base):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
+
+
+def song_columns(include_lyrics: bool = True, entity=Song) -> list:
+    """Columns exposed by the API, on Song or on an aliased Song (e.g. over a subquery)"""
+    columns = [entity.id, entity.track_name, entity.artist_name, entity.album, entity.year, entity.date, entity.created_at]
+    if include_lyrics:
+        columns.append(entity.lyrics)
+    return columns
+
+
+def song_load_options(include_lyrics: bool = True, entity=Song):
+    """
+    Loader option that fetches only the columns exposed by the API
+    
+    The embedding vector and full_text are never returned, and lyrics
+    (typically kilobytes) only when requested.
+    """
+    return load_only(*song_columns(include_lyrics, entity))
@@ -0,0 +1,57 @@
+"""
+Materialized views and summary tables backing the statistics endpoints
+
+Created by scripts/migrations/004_stats_materialized_views.sql and
+007_artist_summary.sql. They live in their own MetaData so
+Base.metadata.create_all() never creates them without their refresh
+machinery (REFRESH schedule, triggers).
+"""
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, Numeric, String, Table
+
+views_metadata = MetaData()
+
+mv_song_stats = Table(
+    "mv_song_stats",
+    views_metadata,
+    Column("id", Integer, primary_key=True),
+    Column("total_songs", Integer),
+    Column("total_artists", Integer),
+    Column("songs_with_embeddings", Integer),
+    Column("min_year", Integer),
+    Column("max_year", Integer),
+    Column("unique_years", Integer),
+    Column("avg_lyrics_length", Numeric),
+)
+
+mv_artist_stats = Table(
+    "mv_artist_stats",
+    views_metadata,
+    Column("artist_name", String(255), primary_key=True),
+    Column("song_count", Integer),
+    Column("earliest_year", Integer),
+    Column("latest_year", Integer),
+    Column("avg_lyrics_length", Numeric),
+)
+
+mv_year_stats = Table(
+    "mv_year_stats",
+    views_metadata,
+    Column("year", Integer, primary_key=True),
+    Column("song_count", Integer),
+    Column("artist_count", Integer),
+)
+
+# Kept up to date by the trg_songs_artist_summary_* triggers on songs
+artist_summary = Table(
+    "artist_summary",
+    views_metadata,
+    Column("artist_name", String(255), primary_key=True),
+    Column("song_count", Integer),
+    Column("earliest_year", Integer),
+    Column("latest_year", Integer),
+    Column("avg_lyrics_length", Numeric),
+    Column("updated_at", DateTime(timezone=True)),
+)
+
+STATS_VIEWS = ("mv_song_stats", "mv_artist_stats", "mv_year_stats")
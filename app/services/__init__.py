@@ -1,4 +1,7 @@
 # Services package
-from .embedding_service import EmbeddingService
+from .embedding_service import EmbeddingService, EmbeddingAPIError, ScoredSong, get_embedding_service
+from .search_cache import SemanticSearchCache, search_cache
+from .vector_index import InMemoryVectorIndex, HnswVectorIndex, vector_index
 
-__all__ = ["EmbeddingService"]
+__all__ = ["EmbeddingService", "EmbeddingAPIError", "ScoredSong", "get_embedding_service", "SemanticSearchCache", "search_cache",
+           "InMemoryVectorIndex", "HnswVectorIndex", "vector_index"]
@@ -0,0 +1,73 @@
+"""
+Persistent embedding cache for the ingestion scripts
+
+Maps sha256(model | dimensions | text) to the embedding in a local SQLite
+file, so re-runs, restarts after a partial failure and songs with identical
+text never pay the OpenAI API twice for the same input.
+"""
+
+import hashlib
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+# Parâmetros por SELECT ... IN (...) (SQLite antigo limita a 999)
+LOOKUP_CHUNK_SIZE = 500
+
+
+class EmbeddingCache:
+    """SQLite-backed text -> embedding cache, scoped to one model and dimension count"""
+
+    def __init__(self, path: str, model: str, dimensions: int):
+        self.model = model
+        self.dimensions = dimensions
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+
+    def key(self, text: str) -> str:
+        """Cache key for a text (the model and dimensions are part of it)"""
+        return hashlib.sha256(f"{self.model}|{self.dimensions}|{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up the embeddings of several texts
+
+        Args:
+            texts: Texts to look up
+
+        Returns:
+            Float16 embedding per text found in the cache (misses are absent)
+        """
+        keys = {self.key(text): text for text in texts}
+        found = {}
+        key_list = list(keys)
+        for i in range(0, len(key_list), LOOKUP_CHUNK_SIZE):
+            chunk = key_list[i:i + LOOKUP_CHUNK_SIZE]
+            rows = self._conn.execute(
+                f"SELECT hash, vector FROM embeddings WHERE hash IN ({','.join('?' * len(chunk))})",
+                chunk
+            )
+            for key, vector in rows:
+                found[keys[key]] = np.frombuffer(vector, dtype=np.float16)
+        return found
+
+    def put_many(self, items: Iterable[Tuple[str, np.ndarray]]) -> None:
+        """Store (text, embedding) pairs; embeddings are kept as float16"""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+            ((self.key(text), np.asarray(embedding, dtype=np.float16).tobytes()) for text, embedding in items)
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        """Close the SQLite connection"""
+        self._conn.close()
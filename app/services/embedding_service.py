@@ -2,144 +2,763 @@
 Embedding service for generating and searching song embeddings using OpenAI API
 """
 
-import requests
-import json
+import asyncio
+import base64
+import logging
+import httpx
+import numpy as np
+import random
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, text, bindparam, cast, String
+from pgvector.sqlalchemy import HALFVEC
 
 from app.config import settings
-from app.models.song import Song
+from app.db.database import AsyncSessionLocal, HalfVecParam, estimate_row_count, estimate_row_count_async
+from app.models.song import HNSW_BUILD_PARAMS, Song, binary_quantized, song_columns, song_load_options
+from app.services.similarity import unit_vector
+from app.services.vector_index import vector_index
+
+try:
+    import h2  # HTTP/2 support for httpx
+except ImportError:  # Optional dependency: pip install "httpx[http2]"
+    h2 = None
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency: pip install tiktoken
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+HNSW_INDEX_NAME = "idx_songs_embedding_hnsw"
+# Embeddings are stored unit length, so inner product ranks exactly like cosine
+HNSW_OPERATOR_CLASS = "halfvec_ip_ops"
+# Partial index over songs with an embedding; its reltuples estimates their count
+EMBEDDED_SONGS_INDEX_NAME = "idx_songs_id_with_embedding"
+
+OPENAI_EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
+
+# OpenAI accepts at most 2048 inputs per embeddings request
+EMBEDDING_BATCH_SIZE = 2048
+# ...and at most 300k tokens summed over the inputs; batches are packed below that
+EMBEDDING_MAX_BATCH_TOKENS = 200_000
+# Estimativa conservadora de tokens sem o tiktoken instalado
+CHARS_PER_TOKEN_ESTIMATE = 3
+
+# batch_search sessions open at once in this process (each holds a pooled connection)
+BATCH_SEARCH_CONCURRENCY = 4
+
+# Retries for transient OpenAI failures (429, 5xx, timeouts): exponential backoff with jitter
+EMBEDDING_MAX_ATTEMPTS = 5
+EMBEDDING_RETRY_INITIAL_DELAY = 0.5  # seconds
+EMBEDDING_RETRY_MAX_DELAY = 8.0  # seconds
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+# (reset, remaining) header pairs of the OpenAI rate limits
+RATELIMIT_HEADERS = (
+    ("x-ratelimit-reset-requests", "x-ratelimit-remaining-requests"),
+    ("x-ratelimit-reset-tokens", "x-ratelimit-remaining-tokens"),
+)
+RATELIMIT_RESET_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Idle keep-alive connections to the OpenAI API kept open for bursts of searches
+EMBEDDING_KEEPALIVE_CONNECTIONS = 32
+
+# Parâmetros HNSW ativos (padrão = os declarados no modelo Song até o auto-tuning rodar)
+_hnsw_params = {**HNSW_BUILD_PARAMS, "ef_search": 100}
+
+
+class EmbeddingAPIError(Exception):
+    """The OpenAI embeddings API request failed (after retrying transient errors)"""
+
+
+def parse_reset_duration(value: str) -> Optional[float]:
+    """Seconds in an x-ratelimit-reset-* header value ("20ms", "1.5s", "6m0s"), None if unparseable"""
+    matches = RATELIMIT_RESET_PATTERN.findall(value.strip())
+    if not matches or "".join(number + unit for number, unit in matches) != value.strip():
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in matches)
+
+
+def retry_delay(attempt: int, response: Optional[httpx.Response] = None) -> float:
+    """
+    Seconds to wait before retry number `attempt` (0-based)
+    
+    Honors the Retry-After header when the API sends one and, on a 429
+    without it, the time until the exhausted rate limit resets
+    (x-ratelimit-reset-requests / -tokens); otherwise exponential backoff
+    with jitter, capped at EMBEDDING_RETRY_MAX_DELAY.
+    """
+    if response is not None:
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return min(float(retry_after), EMBEDDING_RETRY_MAX_DELAY * 4)
+            except ValueError:
+                pass  # formato HTTP-date: cai no backoff exponencial
+        if response.status_code == 429:
+            # Espera pelo limite que estourou (requests ou tokens), não pelo maior dos dois
+            resets = [
+                parse_reset_duration(response.headers[header])
+                for header, remaining in RATELIMIT_HEADERS
+                if header in response.headers and response.headers.get(remaining) == "0"
+            ]
+            resets = [reset for reset in resets if reset is not None]
+            if resets:
+                return min(max(resets) + random.uniform(0, EMBEDDING_RETRY_INITIAL_DELAY), EMBEDDING_RETRY_MAX_DELAY * 4)
+    delay = min(EMBEDDING_RETRY_INITIAL_DELAY * 2 ** attempt, EMBEDDING_RETRY_MAX_DELAY)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def decode_embedding(value) -> np.ndarray:
+    """
+    Embedding from an API response item as a unit-length float16 array
+    
+    Requests ask for encoding_format=base64: the vector arrives as the raw
+    little-endian float32 bytes, so no list of Python floats is ever built.
+    A JSON list (encoding_format=float) is accepted too.
+    """
+    if isinstance(value, str):
+        value = np.frombuffer(base64.b64decode(value), dtype="<f4")
+    return unit_vector(value)
+
+
+@lru_cache(maxsize=4)
+def _tiktoken_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(texts: List[str], model: str) -> List[int]:
+    """
+    Token count of each text for `model`
+    
+    Exact with tiktoken; otherwise a conservative estimate from the length.
+    """
+    encoding = _tiktoken_encoding(model)
+    if encoding is None:
+        return [len(item) // CHARS_PER_TOKEN_ESTIMATE + 1 for item in texts]
+    return [len(tokens) for tokens in encoding.encode_ordinary_batch(texts)]
+
+
+def pack_batches(
+    texts: List[str],
+    token_counts: List[int],
+    max_items: int = EMBEDDING_BATCH_SIZE,
+    max_tokens: int = EMBEDDING_MAX_BATCH_TOKENS
+) -> List[List[str]]:
+    """
+    Greedily split texts into request batches, in order
+    
+    A batch is closed when adding the next text would exceed `max_items`
+    inputs or `max_tokens` tokens, so long lyrics do not push a request
+    over the API limits and short ones still fill it.
+    
+    Args:
+        texts: Texts to embed
+        token_counts: Token count of each text (see count_tokens)
+        max_items: Maximum inputs per batch
+        max_tokens: Maximum summed tokens per batch
+        
+    Returns:
+        Batches of texts; concatenated they give `texts` back
+    """
+    batches: List[List[str]] = []
+    batch: List[str] = []
+    batch_tokens = 0
+    for item, tokens in zip(texts, token_counts):
+        if batch and (len(batch) >= max_items or batch_tokens + tokens > max_tokens):
+            batches.append(batch)
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+@dataclass(slots=True, frozen=True)
+class ScoredSong:
+    """A search hit: the Song row plus its cosine similarity to the query"""
+    song: Song
+    similarity: float
+
+
+# hnsw.ef_search só para a transação atual (is_local = true)
+SET_EF_SEARCH_QUERY = select(func.set_config('hnsw.ef_search', bindparam('ef_search', type_=String), True))
+
+
+@lru_cache(maxsize=4)
+def similar_songs_query(include_lyrics: bool, binary_prefilter: bool = False):
+    """
+    Nearest-neighbour statement for the pgvector backend, built once per option set
+    
+    The query vector is a single bound parameter (:query_embedding) shared by
+    the SELECT list and the ORDER BY, sent as binary halfvec, and :limit is
+    bound too, so every search reuses the same compiled SQL.
+    
+    Stored and query embeddings are unit length, so the negative inner
+    product (<#>) orders exactly like cosine distance without the two norms
+    per row, and the cosine similarity is just -(embedding <#> :query).
+    
+    With binary_prefilter, it is the two-stage search from the pgvector docs:
+    a derived table holds the :candidates nearest rows by Hamming distance
+    between binary-quantized vectors (bit HNSW index, 192 bytes per vector)
+    together with their inner-product distance, and the outer query just
+    sorts those rows. The rerank can't be served by the halfvec HNSW index,
+    so the planner has no way to turn the prefilter into a post-filter of
+    a full-vector scan. Expected plan (EXPLAIN):
+    
+        Limit
+          ->  Sort  (Sort Key: candidates.distance)
+                ->  Subquery Scan on candidates
+                      ->  Limit
+                            ->  Index Scan using idx_songs_embedding_bit_hnsw on songs
+                                  Order By: (binary_quantize(embedding)::bit(N) <~> ...)
+    """
+    dimensions = Song.embedding.type.dim
+    query_vector = bindparam('query_embedding', type_=HalfVecParam(dimensions))
+    distance = Song.embedding.max_inner_product(query_vector)
+    
+    if binary_prefilter:
+        # Estágio 1: candidatos pela distância de Hamming no índice bit
+        candidates = select(
+            *song_columns(include_lyrics),
+            distance.label('distance')
+        ).where(
+            Song.embedding.is_not(None)
+        ).order_by(
+            binary_quantized(Song.embedding).hamming_distance(
+                binary_quantized(cast(query_vector, HALFVEC(dimensions)))
+            )
+        ).limit(bindparam('candidates')).subquery('candidates')
+        candidate_song = aliased(Song, candidates, name='Song')
+        
+        # Estágio 2: rerank dos candidatos pelo produto interno (sort de limit*fator linhas)
+        return select(
+            candidate_song,
+            (-candidates.c.distance).label('similarity_score')
+        ).options(
+            song_load_options(include_lyrics, candidate_song)
+        ).order_by(candidates.c.distance).limit(bindparam('limit'))
+    
+    # Query base com SQLAlchemy ORM
+    query = select(
+        Song,
+        (-distance).label('similarity_score')
+    ).where(
+        Song.embedding.is_not(None)
+    ).options(
+        # Não trazer embedding/full_text (nem lyrics, se não pedido) do banco
+        song_load_options(include_lyrics)
+    )
+    
+    # Ordenar pela distância crescente (maior similaridade primeiro).
+    # ORDER BY embedding <#> :query ASC é a forma que o índice HNSW (halfvec_ip_ops) atende;
+    # o threshold fica fora do SQL para não tirar o planner desse caminho.
+    return query.order_by(distance).limit(bindparam('limit'))
+
+
+def configure_hnsw_params(vector_count: int) -> dict:
+    """
+    Pick HNSW parameters sized to the number of indexed vectors
+    
+    ef_search is a per-query setting and follows the corpus size directly.
+    The build parameters (m/ef_construction) stay at the ones declared on
+    the Song model (HNSW_BUILD_PARAMS) up to a million vectors, so a fresh
+    index never looks mistuned; only larger corpora ask for a bigger graph.
+    
+    Args:
+        vector_count: Number of vectors stored in the index
+        
+    Returns:
+        Dictionary with m, ef_construction and ef_search
+    """
+    if vector_count < 100_000:
+        return {**HNSW_BUILD_PARAMS, "ef_search": 40}
+    elif vector_count < 1_000_000:
+        return {**HNSW_BUILD_PARAMS, "ef_search": 100}
+    else:
+        return {"m": 32, "ef_construction": 200, "ef_search": 200}
+
+
+def get_hnsw_params() -> dict:
+    """Return the HNSW parameters currently in use (ef_search honors HNSW_EF_SEARCH)"""
+    params = dict(_hnsw_params)
+    if settings.HNSW_EF_SEARCH:
+        params["ef_search"] = settings.HNSW_EF_SEARCH
+    return params
+
+
+def estimate_embedding_count(db: Session) -> int:
+    """Planner estimate of the stored embeddings (pg_class.reltuples, no table scan)"""
+    estimate = estimate_row_count(db, EMBEDDED_SONGS_INDEX_NAME)
+    if estimate is None:
+        # Índice parcial ainda sem estatísticas: o total de músicas é o limite superior
+        estimate = estimate_row_count(db, "songs")
+    return estimate or 0
+
+
+def rebuild_hnsw_index(db: Session, params: dict) -> None:
+    """
+    Rebuild the HNSW index with new build parameters, without an unindexed window
+    
+    The replacement is built concurrently under a temporary name and only
+    swapped in once complete (same steps as scripts/migrations/008); if the
+    build fails, the current index is left untouched.
+    
+    Args:
+        db: Database session
+        params: Dictionary with m and ef_construction
+    """
+    new_index_name = f"{HNSW_INDEX_NAME}_new"
+    # CREATE INDEX CONCURRENTLY não pode rodar dentro de uma transação
+    with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Sobra inválida de um rebuild interrompido
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {new_index_name}"))
+        conn.execute(text(
+            f"CREATE INDEX CONCURRENTLY {new_index_name} ON songs "
+            f"USING hnsw (embedding {HNSW_OPERATOR_CLASS}) "
+            f"WITH (m = {int(params['m'])}, ef_construction = {int(params['ef_construction'])})"
+        ))
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {HNSW_INDEX_NAME}"))
+        conn.execute(text(f"ALTER INDEX {new_index_name} RENAME TO {HNSW_INDEX_NAME}"))
+
+
+def tune_hnsw_index(db: Session, rebuild: bool = False) -> dict:
+    """
+    Size the HNSW parameters to the corpus
+    
+    ef_search is applied right away. When the index build parameters differ
+    from the ones the corpus calls for, the index is only rebuilt with
+    rebuild=True (scripts/tune_hnsw_index.py); at app startup it is just
+    reported, since a rebuild can take long on a big table.
+    
+    Args:
+        db: Database session
+        rebuild: Rebuild the index when its m/ef_construction are outdated
+        
+    Returns:
+        Dictionary with the HNSW parameters in use
+    """
+    vector_count = estimate_embedding_count(db)
+    params = configure_hnsw_params(vector_count)
+    
+    reloptions = db.execute(
+        text("SELECT reloptions FROM pg_class WHERE relname = :name"),
+        {"name": HNSW_INDEX_NAME}
+    ).scalar()
+    current = dict(option.split("=", 1) for option in (reloptions or []))
+    
+    if current.get("m") != str(params["m"]) or current.get("ef_construction") != str(params["ef_construction"]):
+        if rebuild:
+            logger.info(
+                f"Rebuilding {HNSW_INDEX_NAME} for ~{vector_count} vectors "
+                f"(m={params['m']}, ef_construction={params['ef_construction']})"
+            )
+            rebuild_hnsw_index(db, params)
+        else:
+            logger.warning(
+                f"{HNSW_INDEX_NAME} build parameters {current or 'unknown'} differ from the ones suggested "
+                f"for ~{vector_count} vectors (m={params['m']}, ef_construction={params['ef_construction']}); "
+                f"run scripts/tune_hnsw_index.py to rebuild it"
+            )
+            # Reportar o que o índice realmente usa
+            params = {
+                **params,
+                "m": int(current.get("m", params["m"])),
+                "ef_construction": int(current.get("ef_construction", params["ef_construction"])),
+            }
+    
+    _hnsw_params.update(params)
+    return get_hnsw_params()
 
 
 class EmbeddingService:
     """Service for handling embeddings generation and similarity search"""
     
+    __slots__ = ("model", "dimensions", "api_url", "client", "semaphore", "query_cache_size", "_query_cache")
+    
     def __init__(self):
         """Initialize the embedding service"""
-        self.api_key = settings.OPENAI_API_KEY
         self.model = settings.EMBEDDING_MODEL
         self.dimensions = settings.EMBEDDING_DIMENSIONS
-        self.api_url = "https://api.openai.com/v1/embeddings"
+        self.api_url = OPENAI_EMBEDDINGS_URL
         
-        # Set up headers for API requests
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
+        # Reuse one async HTTP client so TCP/TLS connections to OpenAI stay warm;
+        # with h2 installed, concurrent requests share one multiplexed connection
+        self.client = httpx.AsyncClient(
+            headers={
+                "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            timeout=30,
+            http2=h2 is not None,
+            limits=httpx.Limits(
+                max_keepalive_connections=EMBEDDING_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=60
+            )
+        )
+        
+        # Caps concurrent embedding requests to stay under the model's rate limits
+        self.semaphore = asyncio.Semaphore(settings.EMBEDDING_MAX_CONCURRENCY)
+        # Sessões extras de batch_search abertas ao mesmo tempo, somando todos os requests
+        self.batch_search_semaphore = asyncio.Semaphore(BATCH_SEARCH_CONCURRENCY)
+        
+        # LRU de embeddings de consulta: (model, dimensions, query normalizada) -> vetor
+        self.query_cache_size = settings.QUERY_EMBEDDING_CACHE_SIZE
+        self._query_cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
     
-    def generate_query_embedding(self, query: str) -> List[float]:
+    def _query_cache_key(self, query: str) -> tuple:
+        # Mesma normalização do search_cache; o modelo na chave evita servir vetores de outro modelo
+        return (self.model, self.dimensions, " ".join(query.lower().split()))
+    
+    async def generate_query_embedding(self, query: str) -> np.ndarray:
         """
         Generate embedding for a search query
         
+        Repeated queries (same text after case/whitespace normalization) are
+        answered from an in-process LRU cache without calling the API.
+        
         Args:
             query: Search query text
             
         Returns:
-            List of float values representing the embedding
+            Unit-length float16 array (matches the halfvec column, and cosine
+            reduces to a dot product); read-only, since it may be shared
+            through the cache
         """
-        try:
-            payload = {
-                "model": self.model,
-                "input": query,
-                "dimensions": self.dimensions
-            }
+        cache_key = self._query_cache_key(query)
+        cached = self._query_cache.get(cache_key)
+        if cached is not None:
+            self._query_cache.move_to_end(cache_key)
+            return cached
+        
+        data = await self._post_embeddings({
+            "model": self.model,
+            "input": query,
+            "dimensions": self.dimensions,
+            "encoding_format": "base64"
+        })
+        embedding = decode_embedding(data['data'][0]['embedding'])
+        
+        if self.query_cache_size > 0:
+            embedding.flags.writeable = False
+            self._query_cache[cache_key] = embedding
+            if len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return embedding
+    
+    async def generate_query_embeddings(self, queries: List[str]) -> List[np.ndarray]:
+        """
+        Generate embeddings for several search queries at once
+        
+        Cached queries are answered from the LRU; the misses go out together
+        through generate_embeddings (up to EMBEDDING_BATCH_SIZE per request),
+        ordered by length so each batch holds inputs of similar size.
+        
+        Args:
+            queries: Search query texts
             
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+        Returns:
+            One read-only, unit-length float16 array per query, in input order
+        """
+        keys = [self._query_cache_key(query) for query in queries]
+        embeddings: dict = {}
+        for key in keys:
+            cached = self._query_cache.get(key)
+            if cached is not None:
+                self._query_cache.move_to_end(key)
+                embeddings[key] = cached
+        
+        # Uma entrada por query normalizada, mesmo que repetida na lista
+        missing = {key: query for key, query in zip(keys, queries) if key not in embeddings}
+        pending = sorted(missing.items(), key=lambda item: len(item[1]))
+        if pending:
+            results = await self.generate_embeddings([query for _, query in pending])
             
-            response.raise_for_status()
+            for (key, _), embedding in zip(pending, results):
+                embedding.flags.writeable = False
+                embeddings[key] = embedding
+                if self.query_cache_size > 0:
+                    self._query_cache[key] = embedding
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        
+        return [embeddings[key] for key in keys]
+    
+    async def _post_embeddings(self, payload: dict) -> dict:
+        """
+        POST to the embeddings endpoint, retrying transient failures
+        
+        429/5xx responses, timeouts and connection errors are retried up to
+        EMBEDDING_MAX_ATTEMPTS times (see retry_delay); other errors fail at once.
+        
+        Args:
+            payload: JSON body (model, input, dimensions, encoding_format)
             
-            data = response.json()
-            return data['data'][0]['embedding']
+        Returns:
+            Decoded JSON response
             
-        except Exception as e:
-            raise Exception(f"Failed to generate query embedding: {str(e)}")
+        Raises:
+            EmbeddingAPIError: The request failed; the cause is chained
+        """
+        for attempt in range(EMBEDDING_MAX_ATTEMPTS):
+            response = None
+            try:
+                response = await self.client.post(self.api_url, json=payload)
+                response.raise_for_status()
+                return response.json()
+            except httpx.HTTPStatusError as e:
+                status_code = e.response.status_code
+                if status_code not in RETRYABLE_STATUS_CODES or attempt == EMBEDDING_MAX_ATTEMPTS - 1:
+                    raise EmbeddingAPIError(f"OpenAI embeddings request failed with status {status_code}") from e
+            except httpx.TransportError as e:  # inclui timeouts
+                if attempt == EMBEDDING_MAX_ATTEMPTS - 1:
+                    raise EmbeddingAPIError(f"OpenAI embeddings request failed: {type(e).__name__}") from e
+            
+            delay = retry_delay(attempt, response)
+            logger.warning(f"OpenAI embeddings request failed (attempt {attempt + 1}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    
+    async def _embed_batch(self, texts: List[str]) -> List[np.ndarray]:
+        """Embed up to EMBEDDING_BATCH_SIZE texts in a single API request"""
+        async with self.semaphore:
+            data = await self._post_embeddings({
+                "model": self.model,
+                "input": texts,
+                "dimensions": self.dimensions,
+                "encoding_format": "base64"
+            })
+        
+        data = sorted(data['data'], key=lambda item: item['index'])
+        return [decode_embedding(item['embedding']) for item in data]
+    
+    async def generate_embeddings(self, texts: List[str]) -> List[np.ndarray]:
+        """
+        Generate embeddings for many texts using batched API requests
+        
+        Texts are packed into batches of at most EMBEDDING_BATCH_SIZE inputs and
+        EMBEDDING_MAX_BATCH_TOKENS tokens; batches run concurrently, bounded by
+        EMBEDDING_MAX_CONCURRENCY.
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One unit-length float16 array per input text, in input order
+        """
+        batches = pack_batches(texts, count_tokens(texts, self.model))
+        results = await asyncio.gather(*(self._embed_batch(batch) for batch in batches))
+        return [embedding for batch in results for embedding in batch]
     
-    def search_similar_songs(
+    async def search_similar_songs(
         self, 
-        db: Session, 
-        query_embedding: List[float], 
+        db: AsyncSession, 
+        query_embedding: np.ndarray, 
         limit: int = 10,
-        threshold: float = 0.0
-    ) -> List[Song]:
+        threshold: float = 0.0,
+        include_lyrics: bool = True
+    ) -> List[ScoredSong]:
         """
         Search for songs similar to the query embedding using cosine similarity
         
         Args:
-            db: Database session
+            db: Async database session
             query_embedding: The query embedding vector
             limit: Maximum number of results to return
             threshold: Minimum similarity threshold (0-1)
+            include_lyrics: Also load the lyrics column
             
         Returns:
-            List of similar songs ordered by similarity score
+            List of ScoredSong ordered by similarity score, highest first
         """
         try:
-            # Usar SQLAlchemy ORM com pgvector - MUITO MAIS SEGURO
-            from sqlalchemy import func
-            
-            # Query base com SQLAlchemy ORM
-            query = select(
-                Song,
-                (1 - Song.embedding.cosine_distance(query_embedding)).label('similarity_score')
-            ).where(
-                Song.embedding.is_not(None)
-            )
+            # Backend em processo (memory/hnswlib) quando configurado e carregado
+            if vector_index is not None and vector_index.ready:
+                return await self._search_in_memory(db, query_embedding, limit, threshold, include_lyrics)
             
-            # Aplicar filtro de threshold se necessário
-            if threshold > 0:
-                query = query.where(
-                    (1 - Song.embedding.cosine_distance(query_embedding)) >= threshold
-                )
-            
-            # Ordenar por similaridade e limitar resultados  
-            # CORREÇÃO: Ordenar por similarity_score decrescente (maior = melhor match)
-            from sqlalchemy import desc
-            query = query.order_by(
-                desc((1 - Song.embedding.cosine_distance(query_embedding)))
-            ).limit(limit)
+            # Usar SQLAlchemy ORM com pgvector - MUITO MAIS SEGURO
+            # Tamanho da lista de candidatos do HNSW (vale apenas para esta transação).
+            # O HNSW devolve no máximo ef_search linhas: nunca menos que o limit pedido
+            # (ou que os candidatos do prefiltro binário)
+            binary_prefilter = settings.VECTOR_SEARCH_BINARY_PREFILTER
+            candidates = limit * settings.VECTOR_SEARCH_RERANK_FACTOR if binary_prefilter else limit
+            ef_search = max(get_hnsw_params()["ef_search"], candidates)
+            await db.execute(SET_EF_SEARCH_QUERY, {"ef_search": str(ef_search)})
             
             # Executar query
-            result = db.execute(query)
+            params = {"query_embedding": query_embedding, "limit": limit}
+            if binary_prefilter:
+                params["candidates"] = candidates
+            result = await db.execute(similar_songs_query(include_lyrics, binary_prefilter), params)
             
-            songs = []
+            scored = []
             for row in result:
-                song = row.Song  # Acessar o objeto Song da tupla
-                # Adicionar similarity score como atributo
-                song.similarity_score = row.similarity_score
-                songs.append(song)
+                # Resultados vêm ordenados: abaixo do threshold, o resto também está
+                if row.similarity_score < threshold:
+                    break
+                scored.append(ScoredSong(song=row.Song, similarity=row.similarity_score))
             
-            return songs
+            return scored
             
         except Exception as e:
             raise Exception(f"Failed to search similar songs: {str(e)}")
     
-    def semantic_search(
+    async def _search_in_memory(
+        self,
+        db: AsyncSession,
+        query_embedding: np.ndarray,
+        limit: int,
+        threshold: float,
+        include_lyrics: bool
+    ) -> List[ScoredSong]:
+        """Rank with the in-process vector index, then fetch the songs by primary key"""
+        # A varredura é CPU pura (dezenas de ms em 100k vetores): fora do event loop
+        ranked = await asyncio.to_thread(vector_index.search, query_embedding, limit)
+        hits = [(song_id, score) for song_id, score in ranked if score >= threshold]
+        if not hits:
+            return []
+        
+        query = select(Song).options(
+            song_load_options(include_lyrics)
+        ).where(Song.id.in_([song_id for song_id, _ in hits]))
+        songs_by_id = {song.id: song for song in (await db.execute(query)).scalars()}
+        
+        return [
+            ScoredSong(song=songs_by_id[song_id], similarity=score)
+            for song_id, score in hits
+            if song_id in songs_by_id  # senão, removida depois do último reload do índice
+        ]
+    
+    async def get_embedding_statistics(self, db: AsyncSession, exact: bool = True) -> dict:
+        """
+        Get statistics about embeddings in the database
+        
+        Args:
+            db: Async database session
+            exact: Run COUNT(*) instead of reading the planner estimates
+                (falls back to COUNT(*) when no estimate exists yet)
+            
+        Returns:
+            Dictionary with embedding statistics
+        """
+        total_songs = songs_with_embeddings = None
+        if not exact:
+            total_songs = await estimate_row_count_async(db, "songs")
+            songs_with_embeddings = await estimate_row_count_async(db, EMBEDDED_SONGS_INDEX_NAME)
+        if total_songs is None or songs_with_embeddings is None:
+            # Uma única varredura para as duas contagens
+            total_songs, songs_with_embeddings = (await db.execute(
+                select(
+                    func.count(),
+                    func.count().filter(Song.embedding.is_not(None))
+                )
+            )).one()
+        # Estimativas independentes podem se cruzar levemente
+        songs_with_embeddings = min(songs_with_embeddings, total_songs)
+        songs_without_embeddings = total_songs - songs_with_embeddings
+        
+        return {
+            "total_songs": total_songs,
+            "songs_with_embeddings": songs_with_embeddings,
+            "songs_without_embeddings": songs_without_embeddings,
+            "embedding_coverage": round(songs_with_embeddings / total_songs * 100, 2) if total_songs > 0 else 0,
+            "embedding_model": self.model,
+            "embedding_dimensions": self.dimensions
+        }
+    
+    async def semantic_search(
         self, 
-        db: Session, 
+        db: AsyncSession, 
         query: str, 
         limit: int = 10,
         threshold: float = 0.7
-    ) -> List[Song]:
+    ) -> List[ScoredSong]:
         """
         Perform semantic search for songs
         
         Args:
-            db: Database session
+            db: Async database session
             query: Search query text
             limit: Maximum number of results to return
             threshold: Minimum similarity threshold (0-1)
             
         Returns:
-            List of similar songs with similarity scores
+            List of ScoredSong ordered by similarity score
         """
         # Generate embedding for the query
-        query_embedding = self.generate_query_embedding(query)
+        query_embedding = await self.generate_query_embedding(query)
         
         # Search for similar songs
-        return self.search_similar_songs(db, query_embedding, limit, threshold)
+        return await self.search_similar_songs(db, query_embedding, limit, threshold)
+    
+    async def batch_search(
+        self,
+        query_embeddings: List[np.ndarray],
+        limit: int = 10,
+        threshold: float = 0.0,
+        include_lyrics: bool = True
+    ) -> List[List[ScoredSong]]:
+        """
+        Run several semantic searches concurrently
+        
+        Each search runs on its own session (and pooled connection); the
+        service-wide batch_search_semaphore keeps at most
+        BATCH_SEARCH_CONCURRENCY of them open across all requests, so batch
+        calls never take over the pool shared with the other endpoints.
+        
+        Args:
+            query_embeddings: Query embeddings (see generate_query_embeddings)
+            limit: Maximum number of results per query
+            threshold: Minimum similarity threshold (0-1)
+            include_lyrics: Also load the lyrics column
+            
+        Returns:
+            One list of ScoredSong per query embedding, in input order
+        """
+        async def search(query_embedding: np.ndarray) -> List[ScoredSong]:
+            # Uma sessão por busca: AsyncSession não pode ser usada por tasks concorrentes
+            async with self.batch_search_semaphore, AsyncSessionLocal() as db:
+                return await self.search_similar_songs(db, query_embedding, limit, threshold, include_lyrics)
+        
+        return await asyncio.gather(*(search(embedding) for embedding in query_embeddings))
+    
+    async def aclose(self) -> None:
+        """Close the underlying HTTP client"""
+        await self.client.aclose()
+
+
+# Process-wide service instance (see get_embedding_service)
+_embedding_service: Optional[EmbeddingService] = None
+
+
+def get_embedding_service() -> EmbeddingService:
+    """
+    Dependency to get the shared embedding service
+    
+    The service is created once per process so its HTTP client is reused
+    across requests instead of being rebuilt on every call.
+    """
+    global _embedding_service
+    if _embedding_service is None:
+        _embedding_service = EmbeddingService()
+    return _embedding_service
+
+
+async def close_embedding_service() -> None:
+    """Close the shared embedding service, if it was created"""
+    global _embedding_service
+    if _embedding_service is not None:
+        await _embedding_service.aclose()
+        _embedding_service = None
@@ -0,0 +1,261 @@
+"""
+Semantic cache for search responses
+
+Two in-process tiers sit in front of the embedding API and the pgvector
+search: an exact match on the normalized query text (skips both) and a
+semantic match on the query embedding (skips the database search).
+An optional Redis tier (SEARCH_CACHE_REDIS_URL) shares responses, keyed
+by the query embedding, across workers and restarts.
+"""
+
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+import orjson
+
+from app.config import settings
+from app.services.similarity import cosine_similarities, normalize_rows
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:  # Optional dependency: pip install redis
+    redis = aioredis = None
+
+logger = logging.getLogger(__name__)
+
+# Prefixo das chaves no Redis (invalidate apaga tudo sob ele)
+SHARED_CACHE_PREFIX = "musicseeker:search:"
+
+
+class _CacheEntry:
+    """Cached search response plus the normalized query embedding that produced it"""
+
+    __slots__ = ("params", "embedding", "response", "expires_at")
+
+    def __init__(self, params: tuple, embedding: np.ndarray, response: dict, expires_at: float):
+        self.params = params
+        self.embedding = embedding
+        self.response = response
+        self.expires_at = expires_at
+
+
+class SemanticSearchCache:
+    """Two-tier (exact + semantic) TTL cache for semantic search responses"""
+
+    def __init__(self, ttl_seconds: int = 300, max_entries: int = 1000, similarity_threshold: float = 0.97):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        # Unit-length float16 embeddings stacked row by row, rebuilt lazily after writes
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_keys: List[str] = []
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Normalize a query so trivially different spellings share a cache key"""
+        return " ".join(query.lower().split())
+
+    def _key(self, query: str, params: tuple) -> str:
+        raw = "|".join([self.normalize_query(query), *map(str, params)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _purge_expired(self) -> None:
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry.expires_at <= now]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def get_exact(self, query: str, params: tuple) -> Optional[dict]:
+        """
+        Tier 1: look up a response by the normalized query text
+
+        Args:
+            query: Search query text
+            params: Request options that change the response (limit, threshold, ...)
+
+        Returns:
+            The cached response dictionary or None on a miss
+        """
+        key = self._key(query, params)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            self._matrix = None
+            return None
+        self._entries.move_to_end(key)
+        return entry.response
+
+    def get_similar(self, query_embedding: np.ndarray, params: tuple) -> Optional[dict]:
+        """
+        Tier 2: look up a response whose query embedding is almost identical
+
+        Args:
+            query_embedding: Unit-length embedding of the search query
+            params: Request options that change the response (limit, threshold, ...)
+
+        Returns:
+            The cached response dictionary or None when no prior query is
+            above the similarity threshold
+        """
+        self._purge_expired()
+        if not self._entries:
+            return None
+
+        if self._matrix is None:
+            self._matrix_keys = list(self._entries.keys())
+            self._matrix = np.stack([self._entries[key].embedding for key in self._matrix_keys])
+
+        query = np.asarray(query_embedding, dtype=np.float16)
+        similarities = cosine_similarities(self._matrix, query, rows_normalized=True, query_normalized=True)
+        for index in np.argsort(similarities)[::-1]:
+            if similarities[index] < self.similarity_threshold:
+                break
+            entry = self._entries[self._matrix_keys[index]]
+            if entry.params == params:
+                return entry.response
+        return None
+
+    def set(self, query: str, query_embedding: np.ndarray, params: tuple, response: dict) -> None:
+        """Store a response in both tiers"""
+        # Stored unit length so lookups are a single dot product; float16
+        # halves the bytes scanned per lookup
+        embedding = normalize_rows(query_embedding).astype(np.float16)
+
+        key = self._key(query, params)
+        self._entries[key] = _CacheEntry(
+            params=params,
+            embedding=embedding,
+            response=response,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._matrix = None
+
+    def invalidate(self) -> None:
+        """
+        Drop every cached response
+        
+        Called after each in-process vector index refresh. The ingestion
+        scripts run in another process and can only clear the Redis tier,
+        so with the pgvector backend SEARCH_CACHE_TTL bounds how long a
+        worker keeps serving results from before a reload.
+        """
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_keys = []
+
+
+def embedding_cache_key(query_embedding: np.ndarray, params: tuple) -> str:
+    """
+    Redis key for a query embedding plus the request options
+
+    The embedding is rounded to 3 decimals (int16) before hashing, so float
+    noise between two calls for the same text still lands on the same key.
+    """
+    quantized = np.round(np.asarray(query_embedding, dtype=np.float32) * 1000).astype(np.int16)
+    digest = hashlib.blake2b(quantized.tobytes(), digest_size=16)
+    digest.update("|".join(map(str, params)).encode("utf-8"))
+    return SHARED_CACHE_PREFIX + digest.hexdigest()
+
+
+class SharedSearchCache:
+    """Redis-backed TTL cache for search responses, shared by every worker"""
+
+    def __init__(self, url: str, ttl_seconds: int = 600):
+        if aioredis is None:
+            raise RuntimeError("SEARCH_CACHE_REDIS_URL requires the redis package")
+        self.ttl_seconds = ttl_seconds
+        self._client = aioredis.from_url(url)
+
+    async def get(self, query_embedding: np.ndarray, params: tuple) -> Optional[dict]:
+        """
+        Look up a response by the query embedding
+
+        Args:
+            query_embedding: Embedding of the search query
+            params: Request options that change the response (limit, threshold, ...)
+
+        Returns:
+            The cached response as plain JSON data, or None on a miss (or
+            when Redis is unreachable: the search just runs uncached)
+        """
+        try:
+            raw = await self._client.get(embedding_cache_key(query_embedding, params))
+        except Exception as e:
+            logger.warning(f"Shared search cache unavailable: {e}")
+            return None
+        return None if raw is None else orjson.loads(raw)
+
+    async def set(self, query_embedding: np.ndarray, params: tuple, response: dict) -> None:
+        """Store a JSON-serializable response for ttl_seconds"""
+        try:
+            await self._client.set(
+                embedding_cache_key(query_embedding, params),
+                orjson.dumps(response),
+                ex=self.ttl_seconds
+            )
+        except Exception as e:
+            logger.warning(f"Shared search cache unavailable: {e}")
+
+    async def aclose(self) -> None:
+        """Close the Redis connection pool"""
+        await self._client.aclose()
+
+
+def invalidate_shared_search_cache(url: Optional[str] = None) -> int:
+    """
+    Delete every response in the shared (Redis) search cache
+
+    Blocking; meant for the ingestion scripts, after songs or embeddings change.
+
+    Args:
+        url: Redis URL (defaults to SEARCH_CACHE_REDIS_URL)
+
+    Returns:
+        Number of deleted keys (0 when no shared cache is configured)
+    """
+    url = url or settings.SEARCH_CACHE_REDIS_URL
+    if not url or redis is None:
+        return 0
+
+    client = redis.Redis.from_url(url)
+    try:
+        deleted = 0
+        keys = []
+        for key in client.scan_iter(match=SHARED_CACHE_PREFIX + "*", count=1000):
+            keys.append(key)
+            if len(keys) >= 1000:
+                deleted += client.unlink(*keys)
+                keys = []
+        if keys:
+            deleted += client.unlink(*keys)
+        return deleted
+    finally:
+        client.close()
+
+
+# Global cache instance shared by the search endpoints
+search_cache = SemanticSearchCache(
+    ttl_seconds=settings.SEARCH_CACHE_TTL,
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+    similarity_threshold=settings.SEARCH_CACHE_SIMILARITY,
+)
+
+# Redis tier (None when SEARCH_CACHE_REDIS_URL is not set)
+shared_search_cache = (
+    SharedSearchCache(settings.SEARCH_CACHE_REDIS_URL, ttl_seconds=settings.SEARCH_CACHE_REDIS_TTL)
+    if settings.SEARCH_CACHE_REDIS_URL else None
+)
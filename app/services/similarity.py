@@ -0,0 +1,68 @@
+"""
+In-process vector similarity helpers
+
+Uses SimSIMD kernels (AVX2/AVX-512/NEON, native float16 support) when the
+optional `simsimd` package is installed, and NumPy otherwise.
+"""
+
+import numpy as np
+
+try:
+    import simsimd
+except ImportError:  # Optional dependency: pip install simsimd
+    simsimd = None
+
+SIMSIMD_DTYPES = (np.float16, np.float32, np.float64)
+
+# Linhas convertidas para float32 por vez no caminho NumPy (4096 x 1536 = 24 MiB)
+SIMILARITY_CHUNK_ROWS = 4096
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize every row of `matrix` (zero rows are left as zeros)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def unit_vector(values) -> np.ndarray:
+    """L2-normalize a single embedding (computed in float32) and store it as float16"""
+    return normalize_rows(values).astype(np.float16)
+
+
+def cosine_similarities(
+    matrix: np.ndarray,
+    query: np.ndarray,
+    rows_normalized: bool = False,
+    query_normalized: bool = False
+) -> np.ndarray:
+    """
+    Cosine similarity between every row of `matrix` and `query`
+
+    Args:
+        matrix: (N, dims) array of vectors
+        query: (dims,) query vector
+        rows_normalized: Rows of `matrix` are already unit length, so the
+            NumPy path is a single matrix-vector product
+        query_normalized: `query` is already unit length (see unit_vector)
+
+    Returns:
+        (N,) float32 array of similarities in [-1, 1]
+    """
+    if simsimd is not None and matrix.dtype == query.dtype and matrix.dtype in SIMSIMD_DTYPES:
+        distances = np.asarray(simsimd.cdist(query[None, :], matrix, metric="cosine"), dtype=np.float32)
+        return 1.0 - distances[0]
+
+    query = np.asarray(query, dtype=np.float32) if query_normalized else normalize_rows(query)
+    if rows_normalized and matrix.dtype == np.float32:
+        return matrix @ query
+
+    # NumPy has no BLAS kernel for float16: widen (and normalize) a block of
+    # rows at a time, so a search never copies the whole matrix
+    similarities = np.empty(len(matrix), dtype=np.float32)
+    for start in range(0, len(matrix), SIMILARITY_CHUNK_ROWS):
+        block = matrix[start:start + SIMILARITY_CHUNK_ROWS]
+        block = np.asarray(block, dtype=np.float32) if rows_normalized else normalize_rows(block)
+        np.matmul(block, query, out=similarities[start:start + SIMILARITY_CHUNK_ROWS])
+    return similarities
@@ -0,0 +1,300 @@
+"""
+In-process vector indexes for semantic search
+
+Two backends keep the song embeddings in RAM so a search never leaves the
+process (the database is only hit to fetch the winning rows):
+
+- memory: every embedding in one contiguous, L2-normalized float16 matrix
+  (N x dims); a search is a single matrix-vector product (exact)
+- auto: the memory backend while the corpus is small enough
+  (VECTOR_INDEX_AUTO_MAX_VECTORS); above that, search stays in pgvector
+- hnswlib: an HNSW graph built at startup; sub-millisecond approximate
+  search (requires the optional `hnswlib` package)
+"""
+
+import asyncio
+import logging
+import time
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.db.database import SessionLocal
+from app.models.song import Song
+from app.services.search_cache import search_cache
+from app.services.similarity import cosine_similarities, normalize_rows
+
+try:
+    import hnswlib
+except ImportError:  # Optional dependency: pip install hnswlib
+    hnswlib = None
+
+logger = logging.getLogger(__name__)
+
+# Linhas lidas do banco por lote ao carregar os embeddings
+LOAD_BATCH_SIZE = 5000
+
+
+def iter_embedding_batches(db: Session) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Stream every stored embedding from the database
+
+    Args:
+        db: Database session
+
+    Returns:
+        Iterator of (ids, vectors) batches: int64 ids and L2-normalized float32 vectors
+    """
+    query = select(Song.id, Song.embedding).where(
+        Song.embedding.is_not(None)
+    ).execution_options(yield_per=LOAD_BATCH_SIZE)
+
+    for rows in db.execute(query).partitions():
+        ids = np.fromiter((row.id for row in rows), dtype=np.int64, count=len(rows))
+        vectors = np.stack([row.embedding.to_numpy() for row in rows])
+        yield ids, normalize_rows(vectors)
+
+
+class InMemoryVectorIndex:
+    """Brute-force cosine index over a contiguous float16 embedding matrix"""
+
+    def __init__(self, dimensions: int, max_vectors: Optional[int] = None):
+        self.dimensions = dimensions
+        # Acima deste tamanho o índice fica vazio e a busca cai no pgvector (backend auto)
+        self.max_vectors = max_vectors
+        # (ids, matrix) trocados juntos para que buscas concorrentes nunca vejam metade de um reload
+        self._data: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self.loaded_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._data is not None
+
+    def __len__(self) -> int:
+        return 0 if self._data is None else len(self._data[0])
+
+    def load(self, db: Session) -> int:
+        """
+        Load (or reload) every stored embedding from the database
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of vectors in the index (0 when the corpus exceeds max_vectors)
+        """
+        start = time.time()
+        id_chunks: List[np.ndarray] = []
+        vector_chunks: List[np.ndarray] = []
+        count = 0
+
+        for ids, vectors in iter_embedding_batches(db):
+            count += len(ids)
+            if self.max_vectors is not None and count > self.max_vectors:
+                self._data = None
+                logger.info(
+                    f"More than {self.max_vectors} embeddings: in-memory index disabled, searching in pgvector"
+                )
+                return 0
+            id_chunks.append(ids)
+            vector_chunks.append(vectors.astype(np.float16))
+
+        if id_chunks:
+            ids = np.concatenate(id_chunks)
+            matrix = np.ascontiguousarray(np.concatenate(vector_chunks))
+        else:
+            ids = np.empty(0, dtype=np.int64)
+            matrix = np.empty((0, self.dimensions), dtype=np.float16)
+
+        self._data = (ids, matrix)
+        self.loaded_at = time.time()
+        logger.info(
+            f"In-memory vector index loaded: {len(ids)} vectors, "
+            f"{matrix.nbytes / 1024 / 1024:.1f} MiB in {time.time() - start:.2f}s"
+        )
+        return len(ids)
+
+    def search(self, query_embedding: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+        """
+        Find the most similar songs to a query embedding
+
+        Args:
+            query_embedding: The unit-length query embedding vector
+            limit: Maximum number of results to return
+
+        Returns:
+            List of (song_id, similarity) ordered by similarity, highest first
+        """
+        if self._data is None:
+            return []
+        ids, matrix = self._data
+        k = min(limit, len(ids))
+        if k == 0:
+            return []
+
+        query = np.asarray(query_embedding, dtype=np.float16)
+        scores = cosine_similarities(matrix, query, rows_normalized=True, query_normalized=True)
+
+        # Top-k sem ordenar o vetor inteiro: O(N) + O(k log k)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def stats(self) -> dict:
+        """Size and freshness of the index, for /search/status"""
+        matrix_bytes = 0 if self._data is None else self._data[1].nbytes
+        return {
+            "backend": "memory",
+            "ready": self.ready,
+            "vectors": len(self),
+            "max_vectors": self.max_vectors,
+            "memory_mb": round(matrix_bytes / 1024 / 1024, 2),
+            "loaded_at": self.loaded_at,
+        }
+
+
+class HnswVectorIndex:
+    """Approximate cosine index backed by an in-process hnswlib HNSW graph"""
+
+    def __init__(self, dimensions: int, m: int = 24, ef_construction: int = 128, ef_search: int = 100):
+        if hnswlib is None:
+            raise RuntimeError("VECTOR_SEARCH_BACKEND=hnswlib requires the hnswlib package")
+        self.dimensions = dimensions
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._index = None
+        self.loaded_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    def __len__(self) -> int:
+        return 0 if self._index is None else self._index.get_current_count()
+
+    def load(self, db: Session) -> int:
+        """
+        Build (or rebuild) the HNSW graph from every stored embedding
+
+        The new graph replaces the old one only once it is complete, so
+        searches keep running against the previous graph during a refresh.
+
+        Args:
+            db: Database session
+
+        Returns:
+            Number of vectors in the index
+        """
+        start = time.time()
+        index = hnswlib.Index(space="cosine", dim=self.dimensions)
+        capacity = LOAD_BATCH_SIZE
+        index.init_index(max_elements=capacity, ef_construction=self.ef_construction, M=self.m)
+
+        count = 0
+        for ids, vectors in iter_embedding_batches(db):
+            if count + len(ids) > capacity:
+                capacity = max(capacity * 2, count + len(ids))
+                index.resize_index(capacity)
+            index.add_items(vectors, ids)
+            count += len(ids)
+
+        index.set_ef(self.ef_search)
+        self._index = index
+        self.loaded_at = time.time()
+        logger.info(
+            f"HNSW vector index built: {count} vectors "
+            f"(m={self.m}, ef_construction={self.ef_construction}) in {time.time() - start:.2f}s"
+        )
+        return count
+
+    def search(self, query_embedding: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+        """
+        Find the most similar songs to a query embedding
+
+        Args:
+            query_embedding: The query embedding vector
+            limit: Maximum number of results to return
+
+        Returns:
+            List of (song_id, similarity) ordered by similarity, highest first
+        """
+        index = self._index
+        if index is None:
+            return []
+        k = min(limit, index.get_current_count())
+        if k == 0:
+            return []
+
+        # ef precisa ser >= k para o HNSW devolver k vizinhos
+        index.set_ef(max(self.ef_search, k))
+        labels, distances = index.knn_query(np.asarray(query_embedding, dtype=np.float32), k=k)
+        return [(int(label), 1.0 - float(distance)) for label, distance in zip(labels[0], distances[0])]
+
+    def stats(self) -> dict:
+        """Size and freshness of the index, for /search/status"""
+        return {
+            "backend": "hnswlib",
+            "ready": self.ready,
+            "vectors": len(self),
+            "m": self.m,
+            "ef_construction": self.ef_construction,
+            "ef_search": self.ef_search,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def create_vector_index(backend: str, dimensions: int):
+    """
+    Create the in-process index for a VECTOR_SEARCH_BACKEND value
+
+    Args:
+        backend: "pgvector", "memory", "auto" or "hnswlib"
+        dimensions: Embedding dimensions
+
+    Returns:
+        The (still empty) index, or None when search runs in pgvector
+    """
+    if backend == "memory":
+        return InMemoryVectorIndex(dimensions=dimensions)
+    if backend == "auto":
+        return InMemoryVectorIndex(dimensions=dimensions, max_vectors=settings.VECTOR_INDEX_AUTO_MAX_VECTORS)
+    if backend == "hnswlib":
+        ef_search = settings.HNSW_EF_SEARCH or 100
+        return HnswVectorIndex(dimensions=dimensions, m=24, ef_construction=128, ef_search=ef_search)
+    if backend != "pgvector":
+        raise ValueError(f"Unknown VECTOR_SEARCH_BACKEND: {backend}")
+    return None
+
+
+def reload_vector_index(index) -> int:
+    """Load the index with a fresh session (blocking; run it in a worker thread)"""
+    with SessionLocal() as db:
+        return index.load(db)
+
+
+async def refresh_vector_index_periodically(index, interval_seconds: int) -> None:
+    """
+    Rebuild the index every `interval_seconds` to pick up new embeddings
+
+    Runs until cancelled; the build happens in a worker thread so requests
+    keep being served (from the previous index) meanwhile. After each
+    reload the in-process search cache is cleared, so cached responses
+    never outlive the index they were ranked with.
+    """
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(reload_vector_index, index)
+        except Exception as e:
+            logger.warning(f"Vector index refresh failed, keeping the previous one: {e}")
+            continue
+        # No event loop (o cache não é thread-safe), depois que o novo índice está no lugar
+        search_cache.invalidate()
+
+
+# Global index instance (None when VECTOR_SEARCH_BACKEND=pgvector)
+vector_index = create_vector_index(settings.VECTOR_SEARCH_BACKEND, settings.EMBEDDING_DIMENSIONS)
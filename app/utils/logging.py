@@ -5,7 +5,12 @@ Secure logging configuration for MusicSeeker
 import logging
 import logging.config
 import os
-from datetime import datetime
+import re
+
+# Redaction patterns for safe_log_error, compiled once
+API_KEY_PATTERN = re.compile(r'sk-[a-zA-Z0-9_-]{20,}')
+# File paths: a run of non-whitespace with at least two slashes
+FILE_PATH_PATTERN = re.compile(r'/\S*/\S*')
 
 # Create logs directory if it doesn't exist
 os.makedirs("logs", exist_ok=True)
@@ -85,10 +90,7 @@ def safe_log_query(query: str) -> str:
 def safe_log_error(error: str) -> str:
     """Safely log errors without exposing sensitive paths or API keys"""
     # Remove potential API keys
-    import re
-    error = re.sub(r'sk-[a-zA-Z0-9-_]{20,}', '[API_KEY_REDACTED]', error)
+    error = API_KEY_PATTERN.sub('[API_KEY_REDACTED]', error)
     
     # Remove full file paths
-    error = re.sub(r'/[^\\s]*(/[^\\s]*)+', '[PATH_REDACTED]', error)
-    
-    return error
+    return FILE_PATH_PATTERN.sub('[PATH_REDACTED]', error)
@@ -0,0 +1,41 @@
+"""
+Small in-process TTL cache for read-mostly API responses
+"""
+
+import time
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """Dictionary whose entries expire `ttl_seconds` after they are stored, capped at `max_entries`"""
+
+    def __init__(self, ttl_seconds: int, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # Ordem de inserção = ordem de expiração (mesmo TTL para todas as entradas)
+        self._entries: dict = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        self._entries.pop(key, None)
+        if len(self._entries) >= self.max_entries:
+            # Descartar as expiradas (as mais antigas primeiro) e, se ainda cheio, a mais antiga
+            for old_key in list(self._entries):
+                if self._entries[old_key][0] > now and len(self._entries) < self.max_entries:
+                    break
+                del self._entries[old_key]
+        self._entries[key] = (now + self.ttl_seconds, value)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -3,29 +3,32 @@
 Debug script para testar a busca semântica
 """
 
+import asyncio
 import os
 import sys
 import requests
-import json
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 
 # Add app directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
 from app.db.database import SessionLocal
+from app.models.song import Song
 from app.services.embedding_service import EmbeddingService
 
+# Queries de teste, embedadas juntas em uma única chamada à API
+PROBE_QUERIES = ["love", "heartbreak and sadness", "dancing and party vibes"]
+
 def test_embedding_generation():
     """Test if embedding generation is working"""
     print("=== Testing Embedding Generation ===")
     
     try:
         service = EmbeddingService()
-        embedding = service.generate_query_embedding("love")
-        print(f"✅ Embedding generated successfully: {len(embedding)} dimensions")
-        print(f"First 5 values: {embedding[:5]}")
-        return embedding
+        embeddings = asyncio.run(service.generate_query_embeddings(PROBE_QUERIES))
+        for query, embedding in zip(PROBE_QUERIES, embeddings):
+            print(f"✅ '{query}': {len(embedding)} dimensions, first 5 values: {embedding[:5]}")
+        return embeddings[0]
     except Exception as e:
         print(f"❌ Error generating embedding: {e}")
         return None
@@ -34,16 +37,13 @@ def test_database_query(query_embedding):
     """Test direct database query"""
     print("\n=== Testing Database Query ===")
     
-    if not query_embedding:
+    if query_embedding is None:
         print("❌ No embedding to test with")
         return
     
     try:
         db = SessionLocal()
         
-        # Convert embedding to string format
-        embedding_str = '[' + ','.join(map(str, query_embedding)) + ']'
-        
         # Test simple query without similarity
         print("Testing basic query...")
         result = db.execute(text("SELECT COUNT(*) as count FROM songs WHERE embedding IS NOT NULL"))
@@ -52,16 +52,17 @@ def test_database_query(query_embedding):
         
         # Test similarity query
         print("Testing similarity query...")
-        sql_query = f"""
+        # Vetor como parâmetro bound (nunca interpolado no SQL)
+        sql_query = text("""
             SELECT id, track_name, artist_name, 
-                   (1 - (embedding <=> '{embedding_str}'::vector)) as similarity_score
+                   (1 - (embedding <=> :query_embedding)) as similarity_score
             FROM songs 
             WHERE embedding IS NOT NULL
-            ORDER BY embedding <=> '{embedding_str}'::vector
+            ORDER BY embedding <=> :query_embedding
             LIMIT 3
-        """
+        """).bindparams(bindparam('query_embedding', type_=Song.embedding.type))
         
-        result = db.execute(text(sql_query))
+        result = db.execute(sql_query, {"query_embedding": query_embedding})
         rows = result.fetchall()
         
         print(f"✅ Similarity query returned {len(rows)} results:")
@@ -1,8 +1,9 @@
 -- Create tables for MusicSeeker application
 -- Run this script manually in Digital Ocean database console if needed
 
--- Enable pgvector extension
+-- Enable pgvector and trigram extensions
 CREATE EXTENSION IF NOT EXISTS vector;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- Create songs table
 CREATE TABLE IF NOT EXISTS songs (
@@ -14,16 +15,27 @@ CREATE TABLE IF NOT EXISTS songs (
     date VARCHAR(50),
     lyrics TEXT NOT NULL,
     full_text TEXT NOT NULL,
-    embedding VECTOR(1536),
+    lyrics_len INTEGER GENERATED ALWAYS AS (length(lyrics)) STORED,
+    embedding HALFVEC(1536),
     created_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
-    updated_at TIMESTAMP WITH TIME ZONE
+    updated_at TIMESTAMP WITH TIME ZONE,
+    -- Unit-length embeddings, so the inner-product index ranks like cosine
+    CONSTRAINT ck_songs_embedding_unit_norm CHECK (embedding IS NULL OR abs(l2_norm(embedding) - 1) < 0.01)
 );
 
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_songs_artist_name ON songs(artist_name);
 CREATE INDEX IF NOT EXISTS idx_songs_track_name ON songs(track_name);
 CREATE INDEX IF NOT EXISTS idx_songs_year ON songs(year);
-CREATE INDEX IF NOT EXISTS idx_songs_embedding ON songs USING ivfflat (embedding vector_cosine_ops) WITH (lists = 100);
+CREATE INDEX IF NOT EXISTS idx_songs_artist_name_trgm ON songs USING gin (artist_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_songs_track_name_trgm ON songs USING gin (track_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_songs_lyrics_fts ON songs USING gin (to_tsvector('simple', lyrics));
+CREATE INDEX IF NOT EXISTS idx_songs_year_artist_name ON songs(year, artist_name) WHERE year IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_songs_id_with_embedding ON songs(id) WHERE embedding IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_songs_id_without_embedding ON songs(id) WHERE embedding IS NULL;
+CREATE INDEX IF NOT EXISTS idx_songs_artist_name_stats ON songs(artist_name) INCLUDE (year, lyrics_len) WHERE lyrics_len > 0;
+CREATE INDEX IF NOT EXISTS idx_songs_embedding_hnsw ON songs USING hnsw (embedding halfvec_ip_ops) WITH (m = 24, ef_construction = 128);
+CREATE INDEX IF NOT EXISTS idx_songs_embedding_bit_hnsw ON songs USING hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops) WITH (m = 24, ef_construction = 128);
 
 -- Grant permissions (adjust username as needed)
 -- GRANT ALL PRIVILEGES ON TABLE songs TO your_username;
@@ -8,6 +8,8 @@ import sys
 # Add app directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+from sqlalchemy import select, func
+
 from app.db.database import SessionLocal
 from app.models.song import Song
 
@@ -22,9 +24,13 @@ def demo_search_functionality():
         # Initialize database
         db = SessionLocal()
         
-        # Get basic statistics
-        total_songs = db.query(Song).count()
-        songs_with_embeddings = db.query(Song).filter(Song.embedding.isnot(None)).count()
+        # Get basic statistics (both counts in a single scan)
+        total_songs, songs_with_embeddings = db.execute(
+            select(
+                func.count(),
+                func.count().filter(Song.embedding.is_not(None))
+            )
+        ).one()
         songs_without_embeddings = total_songs - songs_with_embeddings
         
         print("📊 Current Status:")
@@ -55,7 +61,6 @@ def demo_search_functionality():
             print(f"\n👥 Available artists ({total_songs} songs):")
             
             # Use SQLAlchemy ORM instead of raw SQL
-            from sqlalchemy import select, func
             result = db.execute(
                 select(
                     Song.artist_name,
@@ -72,7 +77,10 @@ def demo_search_functionality():
                 
             # Show sample songs
             print(f"\n🎵 Sample songs:")
-            sample_songs = db.query(Song).limit(5).all()
+            sample_songs = db.execute(
+                select(Song.track_name, Song.artist_name, func.left(Song.lyrics, 60).label('lyrics'))
+                .limit(5)
+            )
             for song in sample_songs:
                 print(f"   - '{song.track_name}' by {song.artist_name}")
                 lyrics_preview = song.lyrics[:60].replace('\n', ' ')
@@ -0,0 +1,24 @@
+"""
+Export the OpenAPI schema to openapi.json at build time
+
+The API loads this file at startup instead of regenerating the schema
+in every container (see load_prebuilt_openapi in app/main.py).
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+import orjson
+from app.main import app, OPENAPI_SCHEMA_FILE
+
+
+def main():
+    """Generate the schema and write it next to the app package"""
+    with open(OPENAPI_SCHEMA_FILE, "wb") as f:
+        f.write(orjson.dumps(app.openapi()))
+    print(f"✅ OpenAPI schema written to {OPENAPI_SCHEMA_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,25 @@ Embedding generation script for MusicSeeker
 
 This script generates OpenAI embeddings for songs that don't have them yet,
 using the text-embedding-3-small model and saves them to the database.
+
+Usage:
+    python scripts/generate_embeddings.py               # embeddings API, concurrent batches
+    python scripts/generate_embeddings.py --batch-api   # OpenAI Batch API (50% cheaper, async turnaround)
+    python scripts/generate_embeddings.py --batch-id batch_abc123   # resume waiting for a submitted job
 """
 
+import argparse
+import asyncio
+import io
+import json
 import os
 import sys
-import time
 import traceback
-import requests
-import json
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+from sqlalchemy import Row, select, update
 from sqlalchemy.orm import Session
 
 # Add app directory to Python path
@@ -19,9 +29,22 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from app.db.database import SessionLocal
 from app.models.song import Song
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_service import EmbeddingService, count_tokens, decode_embedding, pack_batches
+from app.services.search_cache import invalidate_shared_search_cache
 from app.config import settings
 
 
+OPENAI_API_BASE = "https://api.openai.com/v1"
+
+# Limite da Batch API: 50.000 requests por arquivo de entrada
+BATCH_API_MAX_REQUESTS = 50_000
+BATCH_API_POLL_SECONDS = 60
+BATCH_API_FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+# Linhas por UPDATE em lote ao gravar os resultados
+SAVE_CHUNK_SIZE = 1000
+
+
 class EmbeddingGenerator:
     """
     Handles embedding generation for songs using OpenAI API
@@ -33,21 +56,20 @@ class EmbeddingGenerator:
             # Validate OpenAI API key
             settings.validate()
             
-            # Set up API configuration
-            self.api_key = settings.OPENAI_API_KEY
-            self.model = settings.EMBEDDING_MODEL
-            self.dimensions = settings.EMBEDDING_DIMENSIONS
-            self.api_url = "https://api.openai.com/v1/embeddings"
+            # Same async client, batching and retries as the API
+            self.service = EmbeddingService()
+            self.model = self.service.model
+            self.dimensions = self.service.dimensions
             
-            # Set up headers for API requests
-            self.headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            # Textos já embedados em execuções anteriores não voltam para a API
+            self.cache = (
+                EmbeddingCache(settings.EMBEDDING_CACHE_PATH, self.model, self.dimensions)
+                if settings.EMBEDDING_CACHE_ENABLED else None
+            )
             
             print(f"Initialized EmbeddingGenerator with model: {self.model}")
             print(f"Embedding dimensions: {self.dimensions}")
-            print(f"API URL: {self.api_url}")
+            print(f"API URL: {self.service.api_url}")
             
         except Exception as e:
             print(f"❌ Error initializing EmbeddingGenerator:")
@@ -57,25 +79,33 @@ class EmbeddingGenerator:
             traceback.print_exc()
             raise
     
-    def get_songs_without_embeddings(self, db: Session, limit: Optional[int] = None) -> List[Song]:
+    def get_songs_without_embeddings(self, db: Session, limit: Optional[int] = None, after_id: int = 0) -> List[Row]:
         """
-        Get songs that don't have embeddings yet
+        Get songs that don't have embeddings yet, in id order (keyset pagination)
+        
+        Plain (id, full_text) rows, not ORM objects: save_embeddings commits,
+        and expiring loaded Songs would cost a refresh SELECT per song.
         
         Args:
             db: Database session
             limit: Maximum number of songs to retrieve
+            after_id: Only songs with a greater id (the last id of the previous page)
             
         Returns:
-            List of songs without embeddings
+            List of (id, full_text) rows of songs without embeddings
         """
-        query = db.query(Song).filter(Song.embedding.is_(None))
+        query = (
+            select(Song.id, Song.full_text)
+            .where(Song.embedding.is_(None), Song.id > after_id)
+            .order_by(Song.id)
+        )
         
         if limit:
             query = query.limit(limit)
             
-        return query.all()
+        return db.execute(query).all()
     
-    def generate_embedding(self, text: str) -> List[float]:
+    async def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate embedding for a given text using OpenAI API
         
@@ -83,38 +113,16 @@ class EmbeddingGenerator:
             text: Text to generate embedding for
             
         Returns:
-            List of float values representing the embedding
+            Unit-length float16 array representing the embedding
         """
         try:
-            payload = {
-                "model": self.model,
-                "input": text,
-                "dimensions": self.dimensions
-            }
-            
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
-            
-            response.raise_for_status()  # Raise exception for HTTP errors
-            
-            data = response.json()
-            return data['data'][0]['embedding']
-            
-        except requests.exceptions.RequestException as e:
-            print(f"❌ HTTP error generating embedding: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                print(f"   Response status: {e.response.status_code}")
-                print(f"   Response text: {e.response.text}")
-            raise
+            embeddings = await self.service.generate_embeddings([text])
+            return embeddings[0]
         except Exception as e:
             print(f"❌ Error generating embedding: {e}")
             raise
     
-    def generate_embeddings_batch(self, texts: List[str]) -> List[List[float]]:
+    async def generate_embeddings_batch(self, texts: List[str]) -> List[np.ndarray]:
         """
         Generate embeddings for multiple texts in a single API call
         
@@ -122,164 +130,410 @@ class EmbeddingGenerator:
             texts: List of texts to generate embeddings for
             
         Returns:
-            List of embeddings
+            List of unit-length float16 embeddings, in input order
         """
         try:
-            payload = {
-                "model": self.model,
-                "input": texts,
-                "dimensions": self.dimensions
-            }
-            
-            response = requests.post(
-                self.api_url,
-                headers=self.headers,
-                json=payload,
-                timeout=60  # Longer timeout for batch requests
-            )
-            
-            response.raise_for_status()
-            
-            data = response.json()
-            return [item['embedding'] for item in data['data']]
-            
-        except requests.exceptions.RequestException as e:
-            print(f"❌ HTTP error generating batch embeddings: {e}")
-            if hasattr(e, 'response') and e.response is not None:
-                print(f"   Response status: {e.response.status_code}")
-                print(f"   Response text: {e.response.text}")
-            raise
+            return await self.service.generate_embeddings(texts)
         except Exception as e:
             print(f"❌ Error generating batch embeddings: {e}")
             raise
     
-    def process_songs_batch(self, db: Session, songs: List[Song], batch_size: int = 50) -> int:
+    async def process_songs_batch(self, db: Session, songs: List[Row], batch_size: int = 50) -> int:
         """
         Process a batch of songs to generate embeddings
         
+        The API requests for every batch are issued together; the service
+        keeps at most EMBEDDING_MAX_CONCURRENCY in flight and retries 429s
+        with backoff, so no fixed sleeps are needed between batches.
+        
         Args:
             db: Database session
-            songs: List of songs to process
-            batch_size: Number of songs to process in each API call
+            songs: (id, full_text) rows of the songs to process
+            batch_size: Maximum texts per API call (batches are also capped at
+                EMBEDDING_MAX_BATCH_TOKENS tokens)
             
         Returns:
             Number of songs processed successfully
         """
         total_processed = 0
+        if self.cache is not None:
+            cached = self.cache.get_many([song.full_text for song in songs])
+            if cached:
+                total_processed += self.save_embeddings(
+                    db, {song.id: cached[song.full_text] for song in songs if song.full_text in cached}
+                )
+                print(f"💾 {total_processed} songs served from the embedding cache")
+                songs = [song for song in songs if song.full_text not in cached]
         
-        for i in range(0, len(songs), batch_size):
-            batch = songs[i:i + batch_size]
-            batch_texts = [song.full_text for song in batch]
-            
-            print(f"Processing batch {i//batch_size + 1}: {len(batch)} songs")
+        # Relançamentos/remasters repetem a letra: cada texto vai à API uma vez só
+        songs_by_text: Dict[str, List[Row]] = {}
+        for song in songs:
+            songs_by_text.setdefault(song.full_text, []).append(song)
+        if len(songs_by_text) < len(songs):
+            print(f"🔁 {len(songs) - len(songs_by_text)} songs share their text with another song in this round")
+        
+        # Lotes fechados por número de textos ou por tokens, o que vier primeiro
+        texts = list(songs_by_text)
+        batches = pack_batches(texts, count_tokens(texts, self.model), max_items=batch_size)
+        print(f"Processing {len(batches)} batches of up to {batch_size} texts "
+              f"({settings.EMBEDDING_MAX_CONCURRENCY} requests in flight)")
+        
+        results = await asyncio.gather(
+            *(self.generate_embeddings_batch(batch) for batch in batches),
+            return_exceptions=True
+        )
+        
+        # A sessão é usada só aqui, sequencialmente, depois das chamadas à API
+        for number, (batch, embeddings) in enumerate(zip(batches, results), start=1):
+            batch_songs = [song for text in batch for song in songs_by_text[text]]
+            if isinstance(embeddings, Exception):
+                print(f"❌ Error processing batch {number}: {embeddings}")
+                total_processed += await self.process_songs_individually(db, batch_songs)
+                continue
             
             try:
-                # Generate embeddings for the batch
-                embeddings = self.generate_embeddings_batch(batch_texts)
-                
-                # Update songs with embeddings
-                for song, embedding in zip(batch, embeddings):
-                    song.embedding = embedding
-                
-                # Commit the batch
-                db.commit()
-                total_processed += len(batch)
-                
-                print(f"✅ Successfully processed batch {i//batch_size + 1}")
-                
-                # Rate limiting - OpenAI has rate limits
-                if i + batch_size < len(songs):
-                    print("⏱️  Waiting 1 second to respect rate limits...")
-                    time.sleep(1)
-                
+                # Unit length (ck_songs_embedding_unit_norm): inner product == cosine
+                total_processed += self.save_embeddings(db, {
+                    song.id: embedding
+                    for text, embedding in zip(batch, embeddings)
+                    for song in songs_by_text[text]
+                })
+                self.cache_embeddings(zip(batch, embeddings))
+                print(f"✅ Successfully processed batch {number}")
             except Exception as e:
                 db.rollback()
-                print(f"❌ Error processing batch {i//batch_size + 1}: {e}")
-                
-                # Try processing songs individually in this batch
-                print("🔄 Attempting individual processing for failed batch...")
-                for song in batch:
-                    try:
-                        embedding = self.generate_embedding(song.full_text)
-                        song.embedding = embedding
-                        db.commit()
-                        total_processed += 1
-                        print(f"✅ Individual processing successful for song ID {song.id}")
-                        time.sleep(0.5)  # Extra delay for individual requests
-                    except Exception as individual_error:
-                        db.rollback()
-                        print(f"❌ Failed individual processing for song ID {song.id}: {individual_error}")
-                        continue
+                print(f"❌ Error saving batch {number}: {e}")
         
         return total_processed
+    
+    async def process_songs_individually(self, db: Session, songs: List[Row]) -> int:
+        """
+        Retry a failed batch one song per request, so one bad input does not fail the rest
+        
+        Args:
+            db: Database session
+            songs: (id, full_text) rows of the failed batch
+            
+        Returns:
+            Number of songs processed successfully
+        """
+        print("🔄 Attempting individual processing for failed batch...")
+        texts = list(dict.fromkeys(song.full_text for song in songs))
+        results = await asyncio.gather(
+            *(self.generate_embedding(text) for text in texts),
+            return_exceptions=True
+        )
+        embeddings = dict(zip(texts, results))
+        
+        succeeded = {}
+        for song in songs:
+            embedding = embeddings[song.full_text]
+            if isinstance(embedding, Exception):
+                print(f"❌ Failed individual processing for song ID {song.id}: {embedding}")
+                continue
+            succeeded[song.id] = embedding
+        
+        try:
+            processed = self.save_embeddings(db, succeeded)
+        except Exception as e:
+            db.rollback()
+            print(f"❌ Error saving individually processed songs: {e}")
+            return 0
+        self.cache_embeddings(
+            (text, embedding) for text, embedding in embeddings.items() if not isinstance(embedding, Exception)
+        )
+        return processed
+    
+    def cache_embeddings(self, items) -> None:
+        """Store (full_text, embedding) pairs in the persistent cache, when enabled"""
+        if self.cache is not None:
+            self.cache.put_many(items)
+    
+    def batch_api_client(self) -> httpx.AsyncClient:
+        """Client for the Files/Batches endpoints (multipart uploads, so no JSON content type)"""
+        return httpx.AsyncClient(
+            base_url=OPENAI_API_BASE,
+            headers={"Authorization": f"Bearer {settings.OPENAI_API_KEY}"},
+            timeout=300
+        )
+    
+    def build_batch_file(self, songs: List[Tuple[int, str]]) -> bytes:
+        """
+        Serialize one /v1/embeddings request per song as Batch API JSONL
+        
+        Args:
+            songs: (song id, full_text) pairs
+            
+        Returns:
+            JSONL file contents; custom_id carries the song id
+        """
+        lines = [
+            json.dumps({
+                "custom_id": str(song_id),
+                "method": "POST",
+                "url": "/v1/embeddings",
+                "body": {
+                    "model": self.model,
+                    "input": full_text,
+                    "dimensions": self.dimensions,
+                    "encoding_format": "base64"
+                }
+            })
+            for song_id, full_text in songs
+        ]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+    
+    async def submit_batch_job(self, client: httpx.AsyncClient, songs: List[Tuple[int, str]]) -> str:
+        """
+        Upload the requests for `songs` and create a Batch API job
+        
+        Args:
+            client: Client from batch_api_client
+            songs: (song id, full_text) pairs, at most BATCH_API_MAX_REQUESTS
+            
+        Returns:
+            The batch id
+        """
+        upload = await client.post(
+            "/files",
+            data={"purpose": "batch"},
+            files={"file": ("embeddings.jsonl", io.BytesIO(self.build_batch_file(songs)), "application/jsonl")}
+        )
+        upload.raise_for_status()
+        
+        batch = await client.post("/batches", json={
+            "input_file_id": upload.json()["id"],
+            "endpoint": "/v1/embeddings",
+            "completion_window": "24h"
+        })
+        batch.raise_for_status()
+        return batch.json()["id"]
+    
+    async def wait_for_batch(self, client: httpx.AsyncClient, batch_id: str) -> dict:
+        """Poll a batch job until it reaches a final state and return it"""
+        while True:
+            response = await client.get(f"/batches/{batch_id}")
+            response.raise_for_status()
+            batch = response.json()
+            counts = batch.get("request_counts") or {}
+            print(f"⏳ Batch {batch_id}: {batch['status']} "
+                  f"({counts.get('completed', 0)}/{counts.get('total', 0)} requests)")
+            if batch["status"] in BATCH_API_FINAL_STATES:
+                return batch
+            await asyncio.sleep(BATCH_API_POLL_SECONDS)
+    
+    async def download_batch_results(self, client: httpx.AsyncClient, batch: dict) -> Dict[int, np.ndarray]:
+        """
+        Download and parse the output file of a finished batch job
+        
+        Args:
+            client: Client from batch_api_client
+            batch: Batch object returned by wait_for_batch
+            
+        Returns:
+            Unit-length float16 embedding per song id (failed requests are skipped)
+        """
+        if not batch.get("output_file_id"):
+            return {}
+        
+        response = await client.get(f"/files/{batch['output_file_id']}/content")
+        response.raise_for_status()
+        
+        embeddings = {}
+        for line in response.text.splitlines():
+            if not line:
+                continue
+            result = json.loads(line)
+            reply = result.get("response") or {}
+            if reply.get("status_code") != 200:
+                print(f"❌ Batch request for song ID {result['custom_id']} failed: {result.get('error')}")
+                continue
+            embeddings[int(result["custom_id"])] = decode_embedding(reply["body"]["data"][0]["embedding"])
+        return embeddings
+    
+    def save_embeddings(self, db: Session, embeddings: Dict[int, np.ndarray]) -> int:
+        """
+        Write embeddings back with bulk UPDATEs by primary key
+        
+        One executemany of UPDATE ... WHERE id = ? per SAVE_CHUNK_SIZE rows
+        (psycopg pipelines it), instead of an ORM flush per modified song.
+        
+        Args:
+            db: Database session
+            embeddings: Embedding per song id
+            
+        Returns:
+            Number of songs updated
+        """
+        rows = [{"id": song_id, "embedding": embedding} for song_id, embedding in embeddings.items()]
+        for i in range(0, len(rows), SAVE_CHUNK_SIZE):
+            db.execute(update(Song), rows[i:i + SAVE_CHUNK_SIZE])
+            db.commit()
+        return len(rows)
+    
+    async def finish_batch_job(self, client: httpx.AsyncClient, db: Session, batch_id: str) -> int:
+        """Wait for a submitted job, then store its embeddings; returns the songs updated"""
+        batch = await self.wait_for_batch(client, batch_id)
+        if batch["status"] != "completed":
+            print(f"❌ Batch {batch_id} ended as {batch['status']}: {batch.get('errors')}")
+        embeddings = await self.download_batch_results(client, batch)
+        saved = self.save_embeddings(db, embeddings)
+        if self.cache is not None and embeddings:
+            texts = db.execute(select(Song.id, Song.full_text).where(Song.id.in_(embeddings.keys()))).all()
+            self.cache_embeddings((full_text, embeddings[song_id]) for song_id, full_text in texts)
+        print(f"✅ Batch {batch_id}: saved {saved} embeddings")
+        return saved
+    
+    async def aclose(self) -> None:
+        """Close the HTTP client of the embedding service and the embedding cache"""
+        await self.service.aclose()
+        if self.cache is not None:
+            self.cache.close()
 
 
-def main():
+async def run_pipeline():
     """
-    Main function to execute the embedding generation pipeline
+    Generate the missing embeddings (one event loop for the whole run, so the
+    HTTP client and its connections are reused across batches)
     """
+    # Initialize generator
+    generator = EmbeddingGenerator()
+    
+    # Get database session
+    db: Session = SessionLocal()
+    
     try:
-        print("=== MusicSeeker Embedding Generation Pipeline ===\n")
+        # Get total count of songs without embeddings
+        total_songs_without_embeddings = db.query(Song).filter(Song.embedding.is_(None)).count()
+        total_songs = db.query(Song).count()
         
-        # Initialize generator
-        generator = EmbeddingGenerator()
+        print(f"Total songs in database: {total_songs}")
+        print(f"Songs without embeddings: {total_songs_without_embeddings}")
         
-        # Get database session
-        db: Session = SessionLocal()
+        if total_songs_without_embeddings == 0:
+            print("✅ All songs already have embeddings!")
+            return
         
-        try:
-            # Get total count of songs without embeddings
-            total_songs_without_embeddings = db.query(Song).filter(Song.embedding.is_(None)).count()
-            total_songs = db.query(Song).count()
+        # Confirm before proceeding
+        estimated_cost = total_songs_without_embeddings * 0.00002  # Rough estimate for text-embedding-3-small
+        print(f"Estimated cost: ~${estimated_cost:.4f}")
+        
+        # Process in batches
+        batch_size = 50  # Adjust based on rate limits
+        processed_count = 0
+        # Keyset: cada rodada começa depois do último id visto, então músicas que
+        # falharam não voltam e nenhuma consulta revarre as linhas já percorridas
+        last_id = 0
+        
+        while True:
+            # Get next batch of songs without embeddings
+            songs_to_process = generator.get_songs_without_embeddings(db, limit=batch_size * 10, after_id=last_id)
             
-            print(f"Total songs in database: {total_songs}")
-            print(f"Songs without embeddings: {total_songs_without_embeddings}")
+            if not songs_to_process:
+                break
+            last_id = songs_to_process[-1].id
             
-            if total_songs_without_embeddings == 0:
-                print("✅ All songs already have embeddings!")
-                return
+            print(f"\n🔄 Processing {len(songs_to_process)} songs...")
             
-            # Confirm before proceeding
-            estimated_cost = total_songs_without_embeddings * 0.00002  # Rough estimate for text-embedding-3-small
-            print(f"Estimated cost: ~${estimated_cost:.4f}")
+            # Process the batch
+            batch_processed = await generator.process_songs_batch(db, songs_to_process, batch_size)
+            processed_count += batch_processed
             
-            # Process in batches
-            batch_size = 50  # Adjust based on rate limits
-            processed_count = 0
+            print(f"📊 Progress: {processed_count}/{total_songs_without_embeddings} songs processed")
             
-            while True:
-                # Get next batch of songs without embeddings
-                songs_to_process = generator.get_songs_without_embeddings(db, limit=batch_size * 10)
-                
-                if not songs_to_process:
-                    break
-                
-                print(f"\n🔄 Processing {len(songs_to_process)} songs...")
-                
-                # Process the batch
-                batch_processed = generator.process_songs_batch(db, songs_to_process, batch_size)
-                processed_count += batch_processed
+            # Nada avançou (API fora do ar?): não gastar as rodadas restantes em falhas
+            if batch_processed == 0:
+                print("⚠️  No songs could be processed in this round, stopping")
+                break
+        
+        print(f"\n=== Embedding generation completed! ===")
+        print(f"✅ Successfully processed {processed_count} songs")
+        
+        # Final statistics
+        songs_with_embeddings = total_songs - total_songs_without_embeddings + processed_count
+        print(f"📊 Final statistics:")
+        print(f"   - Total songs: {total_songs}")
+        print(f"   - Songs with embeddings: {songs_with_embeddings}")
+        print(f"   - Coverage: {songs_with_embeddings/total_songs*100:.1f}%")
+        
+        # Resultados de busca em cache não incluem as músicas recém-embedadas
+        invalidated = invalidate_shared_search_cache()
+        if invalidated:
+            print(f"🧹 Cleared {invalidated} cached search results")
+        
+    finally:
+        db.close()
+        await generator.aclose()
+
+
+async def run_batch_api_pipeline(batch_ids: Optional[List[str]] = None):
+    """
+    Generate the missing embeddings through the OpenAI Batch API
+    
+    Submits every song without an embedding (in jobs of up to
+    BATCH_API_MAX_REQUESTS requests), waits for the jobs and bulk-updates
+    the results. With `batch_ids`, only waits for already submitted jobs.
+    """
+    generator = EmbeddingGenerator()
+    db: Session = SessionLocal()
+    
+    try:
+        async with generator.batch_api_client() as client:
+            if not batch_ids:
+                songs = db.execute(
+                    select(Song.id, Song.full_text).where(Song.embedding.is_(None)).order_by(Song.id)
+                ).all()
+                if not songs:
+                    print("✅ All songs already have embeddings!")
+                    return
                 
-                print(f"📊 Progress: {processed_count}/{total_songs_without_embeddings} songs processed")
+                if generator.cache is not None:
+                    cached = generator.cache.get_many([full_text for _, full_text in songs])
+                    if cached:
+                        saved_from_cache = generator.save_embeddings(
+                            db, {song_id: cached[full_text] for song_id, full_text in songs if full_text in cached}
+                        )
+                        print(f"💾 {saved_from_cache} songs served from the embedding cache")
+                        songs = [(song_id, full_text) for song_id, full_text in songs if full_text not in cached]
                 
-                # Check if we're done
-                remaining = db.query(Song).filter(Song.embedding.is_(None)).count()
-                if remaining == 0:
-                    break
-            
-            print(f"\n=== Embedding generation completed! ===")
-            print(f"✅ Successfully processed {processed_count} songs")
-            
-            # Final statistics
-            songs_with_embeddings = db.query(Song).filter(Song.embedding.isnot(None)).count()
-            print(f"📊 Final statistics:")
-            print(f"   - Total songs: {total_songs}")
-            print(f"   - Songs with embeddings: {songs_with_embeddings}")
-            print(f"   - Coverage: {songs_with_embeddings/total_songs*100:.1f}%")
-            
-        finally:
-            db.close()
+                batch_ids = []
+                for i in range(0, len(songs), BATCH_API_MAX_REQUESTS):
+                    batch_id = await generator.submit_batch_job(client, songs[i:i + BATCH_API_MAX_REQUESTS])
+                    batch_ids.append(batch_id)
+                    print(f"📤 Submitted {batch_id} ({len(songs[i:i + BATCH_API_MAX_REQUESTS])} songs)")
+                if batch_ids:
+                    print(f"Resume later with: --batch-id {' '.join(batch_ids)}")
             
+            saved = 0
+            for batch_id in batch_ids:
+                saved += await generator.finish_batch_job(client, db, batch_id)
+        
+        print(f"\n=== Batch embedding generation completed: {saved} songs ===")
+        invalidated = invalidate_shared_search_cache()
+        if invalidated:
+            print(f"🧹 Cleared {invalidated} cached search results")
+    finally:
+        db.close()
+        await generator.aclose()
+
+
+def main():
+    """
+    Main function to execute the embedding generation pipeline
+    """
+    parser = argparse.ArgumentParser(description="Generate embeddings for songs without one")
+    parser.add_argument("--batch-api", action="store_true",
+                        help="Use the OpenAI Batch API (50%% cheaper, results within 24h)")
+    parser.add_argument("--batch-id", nargs="+", metavar="BATCH_ID",
+                        help="Wait for already submitted Batch API jobs and store their results")
+    args = parser.parse_args()
+    
+    try:
+        print("=== MusicSeeker Embedding Generation Pipeline ===\n")
+        if args.batch_api or args.batch_id:
+            asyncio.run(run_batch_api_pipeline(args.batch_id))
+        else:
+            asyncio.run(run_pipeline())
     except Exception as e:
         print(f"❌ Error in embedding generation pipeline:")
         print(f"   Error: {str(e)}")
@@ -1,5 +1,6 @@
--- Enable pgvector extension
+-- Enable pgvector and trigram extensions
 CREATE EXTENSION IF NOT EXISTS vector;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
 
 -- Create indexes for better performance
 -- (Will be created later by SQLAlchemy migrations)
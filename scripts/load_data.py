@@ -10,7 +10,9 @@ import sys
 import pandas as pd
 import re
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, Iterable, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import func, insert, select
+from sqlalchemy.schema import CreateIndex, DropIndex
 from sqlalchemy.orm import Session
 
 # Add app directory to Python path
@@ -18,6 +20,13 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
 from app.db.database import SessionLocal, create_tables, engine
 from app.models.song import Song
+from app.services.search_cache import invalidate_shared_search_cache
+
+
+# Compilados uma vez: usados por linha em clean_text e na coluna inteira em clean_text_series
+WHITESPACE_PATTERN = re.compile(r'\s+')
+# Special characters, except basic punctuation
+SPECIAL_CHARS_PATTERN = re.compile(r'[^\w\s\.,!?;:\-\'\"()]')
 
 
 def clean_text(text: str) -> str:
@@ -33,108 +42,127 @@ def clean_text(text: str) -> str:
     if not isinstance(text, str):
         return ""
     
-    # Convert to UTF-8 and normalize
-    text = str(text).encode('utf-8', errors='ignore').decode('utf-8')
-    
-    # Remove extra whitespace and normalize
-    text = re.sub(r'\s+', ' ', text.strip())
-    
     # Remove special characters but keep basic punctuation
-    text = re.sub(r'[^\w\s\.,!?;:\-\'\"()]', ' ', text)
+    text = SPECIAL_CHARS_PATTERN.sub(' ', text)
     
-    # Remove multiple spaces again
-    text = re.sub(r'\s+', ' ', text.strip())
+    # Collapse whitespace
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def clean_text_series(values: pd.Series) -> pd.Series:
+    """
+    Vectorized clean_text for a whole column (pandas string methods instead of a per-row apply)
     
-    return text
+    Args:
+        values: Raw text column
+        
+    Returns:
+        Cleaned text column; non-string values become ""
+    """
+    text = values.where(values.map(type) == str, "")
+    text = text.str.replace(SPECIAL_CHARS_PATTERN, ' ', regex=True)
+    return text.str.replace(WHITESPACE_PATTERN, ' ', regex=True).str.strip()
 
 
-def create_full_text(track_name: str, artist_name: str, lyrics: str) -> str:
+def create_full_text(track_name, artist_name, lyrics):
     """
     Create combined full text field for better semantic search
     
+    Works on single strings and, vectorized, on whole columns.
+    
     Args:
-        track_name: Song title
-        artist_name: Artist name
-        lyrics: Song lyrics
+        track_name: Cleaned song title(s)
+        artist_name: Cleaned artist name(s)
+        lyrics: Cleaned song lyrics
         
     Returns:
-        Combined text string
+        Combined text (a string, or a Series when given Series)
     """
-    # Clean individual components
-    clean_track = clean_text(track_name)
-    clean_artist = clean_text(artist_name)
-    clean_lyrics = clean_text(lyrics)
-    
     # Combine with clear separators for better embedding
-    full_text = f"Title: {clean_track}. Artist: {clean_artist}. Lyrics: {clean_lyrics}"
-    
-    return full_text
+    return "Title: " + track_name + ". Artist: " + artist_name + ". Lyrics: " + lyrics
+
+
+# Colunas lidas dos CSVs (as demais, p.ex. índices exportados, nem são parseadas)
+CSV_REQUIRED_COLUMNS = ['Artist', 'Title', 'Lyric']
+CSV_TEXT_COLUMNS = CSV_REQUIRED_COLUMNS + ['Album', 'Date']
+CSV_COLUMNS = CSV_TEXT_COLUMNS + ['Year']
 
+# Linhas por chunk lido de cada CSV: a memória não cresce com o tamanho do corpus
+CSV_CHUNK_SIZE = 50_000
 
-def load_csv_files(data_dir: str = "data/lyrics") -> pd.DataFrame:
+# Colunas do DataFrame processado gravadas na tabela songs
+SONG_COLUMNS = ['track_name', 'artist_name', 'album', 'year', 'date', 'lyrics', 'full_text']
+
+
+def find_csv_files(data_dir: str = "data/lyrics") -> List[Path]:
     """
-    Load and combine all CSV files from the data directory
+    List the CSV files of the data directory
     
     Args:
         data_dir: Directory containing CSV files
         
     Returns:
-        Combined DataFrame with all songs
+        Paths of the CSV files
     """
-    data_path = Path(data_dir)
-    csv_files = list(data_path.glob("*.csv"))
+    csv_files = sorted(Path(data_dir).glob("*.csv"))
     
     if not csv_files:
         raise FileNotFoundError(f"No CSV files found in {data_dir}")
     
     print(f"Found {len(csv_files)} CSV files to process")
+    return csv_files
+
+
+def iter_csv_chunks(csv_files: List[Path], chunksize: int = CSV_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """
+    Stream the songs of every CSV file, at most `chunksize` rows at a time
     
-    all_dataframes = []
-    
+    Args:
+        csv_files: CSV files to read
+        chunksize: Rows per chunk
+        
+    Returns:
+        Iterator of raw DataFrame chunks (files missing a required column are skipped)
+    """
     for csv_file in csv_files:
         print(f"Loading {csv_file.name}...")
         try:
-            df = pd.read_csv(csv_file)
-            
-            # Validate required columns
-            required_columns = ['Artist', 'Title', 'Lyric']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                print(f"Warning: {csv_file.name} missing columns: {missing_columns}")
-                continue
-            
-            # Add source file for tracking
-            df['source_file'] = csv_file.stem
-            all_dataframes.append(df)
-            print(f"Loaded {len(df)} songs from {csv_file.name}")
+            with pd.read_csv(
+                csv_file,
+                usecols=lambda column: column in CSV_COLUMNS,
+                dtype={column: 'string' for column in CSV_TEXT_COLUMNS},
+                engine='c',
+                chunksize=chunksize
+            ) as reader:
+                for df in reader:
+                    # Validate required columns
+                    missing_columns = [col for col in CSV_REQUIRED_COLUMNS if col not in df.columns]
+                    
+                    if missing_columns:
+                        print(f"Warning: {csv_file.name} missing columns: {missing_columns}")
+                        break
+                    
+                    # Add source file for tracking
+                    df['source_file'] = csv_file.stem
+                    yield df
             
         except Exception as e:
             print(f"Error loading {csv_file.name}: {e}")
             continue
-    
-    if not all_dataframes:
-        raise ValueError("No valid CSV files could be loaded")
-    
-    # Combine all dataframes
-    combined_df = pd.concat(all_dataframes, ignore_index=True)
-    print(f"\nTotal songs loaded: {len(combined_df)}")
-    
-    return combined_df
 
 
-def preprocess_dataframe(df: pd.DataFrame) -> pd.DataFrame:
+def preprocess_dataframe(df: pd.DataFrame, seen: Optional[Set[Tuple[str, str]]] = None) -> pd.DataFrame:
     """
-    Preprocess the combined dataframe
+    Preprocess a chunk of raw songs
     
     Args:
-        df: Raw combined dataframe
+        df: Raw dataframe (one CSV chunk)
+        seen: (track_name, artist_name) keys of the chunks already processed;
+            songs found there are dropped as duplicates and the new keys are added
         
     Returns:
         Preprocessed dataframe
     """
-    print("Preprocessing data...")
-    
     # Map columns to our schema
     df_processed = df.rename(columns={
         'Artist': 'artist_name',
@@ -143,7 +171,7 @@ def preprocess_dataframe(df: pd.DataFrame) -> pd.DataFrame:
         'Album': 'album',
         'Year': 'year',
         'Date': 'date'
-    }).copy()
+    })
     
     # Fill missing values
     df_processed['album'] = df_processed.get('album', '').fillna('Unknown')
@@ -151,43 +179,130 @@ def preprocess_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     df_processed['date'] = df_processed.get('date', '').fillna('')
     
     # Clean text fields
-    print("Cleaning text data...")
-    df_processed['track_name'] = df_processed['track_name'].apply(clean_text)
-    df_processed['artist_name'] = df_processed['artist_name'].apply(clean_text)
-    df_processed['lyrics'] = df_processed['lyrics'].apply(clean_text)
+    for column in ('track_name', 'artist_name', 'lyrics'):
+        df_processed[column] = clean_text_series(df_processed[column])
     
     # Create full_text field
-    print("Creating full_text field...")
-    df_processed['full_text'] = df_processed.apply(
-        lambda row: create_full_text(row['track_name'], row['artist_name'], row['lyrics']),
-        axis=1
+    df_processed['full_text'] = create_full_text(
+        df_processed['track_name'], df_processed['artist_name'], df_processed['lyrics']
     )
     
-    # Remove duplicates based on track_name + artist_name
-    print("Removing duplicates...")
-    before_dedup = len(df_processed)
+    # Remove duplicates based on track_name + artist_name (also across chunks)
     df_processed = df_processed.drop_duplicates(subset=['track_name', 'artist_name'], keep='first')
-    after_dedup = len(df_processed)
-    print(f"Removed {before_dedup - after_dedup} duplicate songs")
+    if seen is not None:
+        keys = list(zip(df_processed['track_name'], df_processed['artist_name']))
+        df_processed = df_processed[[key not in seen for key in keys]]
+        seen.update(keys)
     
     # Filter out rows with empty essential fields
-    df_processed = df_processed[
+    return df_processed[
         (df_processed['track_name'].str.len() > 0) &
         (df_processed['artist_name'].str.len() > 0) &
         (df_processed['lyrics'].str.len() > 10)  # At least 10 characters in lyrics
     ]
+
+
+def iter_song_rows(data_dir: str = "data/lyrics") -> Iterator[pd.DataFrame]:
+    """
+    The whole ingestion pipeline as a stream: read, clean and deduplicate
+    CSV chunks, yielding rows ready for the songs table
     
-    print(f"Final dataset size: {len(df_processed)} songs")
-    return df_processed
+    Only one chunk (plus the set of seen title/artist keys) is in memory at a time.
+    
+    Args:
+        data_dir: Directory containing CSV files
+        
+    Returns:
+        Iterator of DataFrames with SONG_COLUMNS, NA mapped to None
+    """
+    seen: Set[Tuple[str, str]] = set()
+    for chunk in iter_csv_chunks(find_csv_files(data_dir)):
+        songs = preprocess_dataframe(chunk, seen)
+        # Linhas prontas para o banco: NaN/NA viram None e o ano vira int
+        columns = songs[SONG_COLUMNS].astype({'year': 'Int64'}).astype(object)
+        yield columns.where(columns.notna(), None)
+
+
+def drop_song_indexes(db: Session) -> None:
+    """Drop the secondary indexes of songs so a bulk load skips per-row index maintenance"""
+    for index in Song.__table__.indexes:
+        db.execute(DropIndex(index, if_exists=True))
+
+
+def create_song_indexes(db: Session) -> None:
+    """(Re)build the secondary indexes of songs, one bulk build per index"""
+    for index in Song.__table__.indexes:
+        print(f"Building index {index.name}...")
+        db.execute(CreateIndex(index, if_not_exists=True))
+
+
+def copy_songs(db: Session, chunks: Iterable[pd.DataFrame]) -> int:
+    """
+    Stream rows into the songs table with a single COPY FROM STDIN (psycopg 3)
+    
+    Args:
+        db: Database session (the COPY joins its current transaction)
+        chunks: DataFrames with SONG_COLUMNS, NA already mapped to None
+        
+    Returns:
+        Number of rows copied
+    """
+    copied = 0
+    cursor = db.connection().connection.cursor()
+    try:
+        with cursor.copy(f"COPY songs ({', '.join(SONG_COLUMNS)}) FROM STDIN") as copy:
+            for rows in chunks:
+                for row in rows.itertuples(index=False, name=None):
+                    copy.write_row(row)
+                copied += len(rows)
+                print(f"Copied {copied} songs...")
+    finally:
+        cursor.close()
+    return copied
+
+
+def insert_songs(db: Session, chunks: Iterable[pd.DataFrame], batch_size: int) -> int:
+    """
+    Bulk INSERT rows into the songs table, batch_size rows per statement
+    
+    Args:
+        db: Database session (the INSERTs join its current transaction)
+        chunks: DataFrames with SONG_COLUMNS, NA already mapped to None
+        batch_size: Number of records per bulk INSERT (sent as multi-row
+            VALUES by SQLAlchemy's insertmanyvalues)
+        
+    Returns:
+        Number of rows inserted
+    """
+    songs_created = 0
+    for rows in chunks:
+        records = rows.to_dict(orient='records')
+        for i in range(0, len(records), batch_size):
+            batch = records[i:i + batch_size]
+            db.execute(insert(Song), batch)
+            
+            songs_created += len(batch)
+            print(f"Saved {songs_created} songs...")
+    return songs_created
 
 
-def save_to_database(df: pd.DataFrame, batch_size: int = 100) -> None:
+def save_to_database(song_rows: Callable[[], Iterable[pd.DataFrame]], batch_size: int = 5000) -> int:
     """
-    Save preprocessed data to PostgreSQL database
+    Replace the songs table with the rows of the ingestion pipeline
+    
+    The table is replaced in a single transaction with COPY; when the
+    server or driver rejects COPY it falls back to batched INSERTs, in a
+    single transaction too. The secondary indexes are dropped during the
+    load and rebuilt once at the end, so a failed load rolls back to the
+    previous rows with every index in place.
     
     Args:
-        df: Preprocessed dataframe
-        batch_size: Number of records to insert per batch
+        song_rows: Returns a fresh stream of row chunks (see iter_song_rows);
+            called again if the COPY has to be redone as INSERTs
+        batch_size: Number of records per bulk INSERT in the fallback path
+        
+    Returns:
+        Number of songs saved
     """
     print("Saving to database...")
     
@@ -200,37 +315,26 @@ def save_to_database(df: pd.DataFrame, batch_size: int = 100) -> None:
         # Clear existing data (optional - remove if you want to append)
         print("Clearing existing songs...")
         db.query(Song).delete()
-        db.commit()
+        drop_song_indexes(db)
         
-        total_songs = len(df)
-        songs_created = 0
+        try:
+            songs_created = copy_songs(db, song_rows())
+        except Exception as e:
+            db.rollback()
+            print(f"COPY failed ({e}), falling back to batched INSERTs...")
+            db.query(Song).delete()
+            drop_song_indexes(db)
+            songs_created = insert_songs(db, song_rows(), batch_size)
         
-        # Process in batches
-        for i in range(0, total_songs, batch_size):
-            batch = df.iloc[i:i + batch_size]
-            
-            song_objects = []
-            for _, row in batch.iterrows():
-                song = Song(
-                    track_name=row['track_name'],
-                    artist_name=row['artist_name'],
-                    album=row.get('album', 'Unknown'),
-                    year=int(row['year']) if pd.notna(row.get('year')) else None,
-                    date=row.get('date', ''),
-                    lyrics=row['lyrics'],
-                    full_text=row['full_text']
-                )
-                song_objects.append(song)
-            
-            # Bulk insert batch
-            db.bulk_save_objects(song_objects)
-            db.commit()
-            
-            songs_created += len(song_objects)
-            print(f"Saved batch {i//batch_size + 1}: {songs_created}/{total_songs} songs")
+        create_song_indexes(db)
+        db.commit()
         
         print(f"Successfully saved {songs_created} songs to database!")
         
+        # A tabela foi recarregada: resultados em cache apontam para músicas antigas
+        invalidate_shared_search_cache()
+        return songs_created
+        
     except Exception as e:
         db.rollback()
         print(f"Error saving to database: {e}")
@@ -239,6 +343,22 @@ def save_to_database(df: pd.DataFrame, batch_size: int = 100) -> None:
         db.close()
 
 
+def print_statistics() -> None:
+    """Print summary statistics of the loaded songs (computed by the database)"""
+    with SessionLocal() as db:
+        stats = db.execute(select(
+            func.count(func.distinct(Song.artist_name)).label("artists"),
+            func.min(Song.year).label("min_year"),
+            func.max(Song.year).label("max_year"),
+            func.avg(Song.lyrics_len).label("avg_lyrics_len")
+        )).one()
+    
+    print("\nDataset statistics:")
+    print(f"- Unique artists: {stats.artists}")
+    print(f"- Year range: {stats.min_year} - {stats.max_year}")
+    print(f"- Average lyrics length: {stats.avg_lyrics_len or 0:.0f} characters")
+
+
 def main():
     """
     Main function to execute the data loading pipeline
@@ -246,23 +366,14 @@ def main():
     try:
         print("=== MusicSeeker Data Loading Pipeline ===\n")
         
-        # Load CSV files
-        df_raw = load_csv_files()
-        
-        # Preprocess data
-        df_processed = preprocess_dataframe(df_raw)
-        
-        # Save to database
-        save_to_database(df_processed)
+        # Read, clean and save the CSVs chunk by chunk
+        songs_saved = save_to_database(iter_song_rows)
         
         print("\n=== Data loading completed successfully! ===")
-        print(f"Total songs in database: {len(df_processed)}")
+        print(f"Total songs in database: {songs_saved}")
         
         # Show sample statistics
-        print("\nDataset statistics:")
-        print(f"- Unique artists: {df_processed['artist_name'].nunique()}")
-        print(f"- Year range: {df_processed['year'].min()} - {df_processed['year'].max()}")
-        print(f"- Average lyrics length: {df_processed['lyrics'].str.len().mean():.0f} characters")
+        print_statistics()
         
     except Exception as e:
         print(f"Error in data loading pipeline: {e}")
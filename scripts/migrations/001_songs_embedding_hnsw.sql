@@ -0,0 +1,21 @@
+-- Migration 001: HNSW index for semantic search
+-- Replaces the sequential scan done by ORDER BY embedding <=> :query with an
+-- approximate nearest neighbour search over an HNSW graph.
+--
+-- Run manually (outside a transaction block, CREATE INDEX CONCURRENTLY
+-- does not support transactions):
+--   psql "$DATABASE_URL" -f scripts/migrations/001_songs_embedding_hnsw.sql
+
+-- Faster index build: more parallel workers and memory for the graph
+SET max_parallel_maintenance_workers = 7;
+SET maintenance_work_mem = '2GB';
+
+-- The old IVFFlat index (scripts/create_tables.sql) is superseded by HNSW
+DROP INDEX CONCURRENTLY IF EXISTS idx_songs_embedding;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_embedding_hnsw
+    ON songs USING hnsw (embedding vector_cosine_ops)
+    WITH (m = 24, ef_construction = 128);
+
+RESET maintenance_work_mem;
+RESET max_parallel_maintenance_workers;
@@ -0,0 +1,22 @@
+-- Migration 002: store embeddings as half precision (halfvec, pgvector >= 0.7.0)
+-- Halves the bytes read per row and per HNSW graph node for a negligible
+-- recall loss on text-embedding-3-small vectors.
+--
+-- Run manually (outside a transaction block):
+--   psql "$DATABASE_URL" -f scripts/migrations/002_songs_embedding_halfvec.sql
+
+-- The vector_cosine_ops index cannot be kept across the type change
+DROP INDEX CONCURRENTLY IF EXISTS idx_songs_embedding_hnsw;
+
+ALTER TABLE songs
+    ALTER COLUMN embedding TYPE halfvec(1536) USING embedding::halfvec(1536);
+
+SET max_parallel_maintenance_workers = 7;
+SET maintenance_work_mem = '2GB';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_embedding_hnsw
+    ON songs USING hnsw (embedding halfvec_cosine_ops)
+    WITH (m = 24, ef_construction = 128);
+
+RESET maintenance_work_mem;
+RESET max_parallel_maintenance_workers;
@@ -0,0 +1,18 @@
+-- Migration 003: indexes for the /songs text filters
+-- Leading-wildcard ILIKE ('%term%') cannot use a btree index. Trigram GIN
+-- indexes serve ILIKE on artist_name / track_name, and a full-text GIN index
+-- serves the lyrics search (to_tsvector('simple', lyrics) @@ websearch_to_tsquery).
+--
+-- Run manually (outside a transaction block):
+--   psql "$DATABASE_URL" -f scripts/migrations/003_songs_text_search_indexes.sql
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_artist_name_trgm
+    ON songs USING gin (artist_name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_track_name_trgm
+    ON songs USING gin (track_name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_lyrics_fts
+    ON songs USING gin (to_tsvector('simple', lyrics));
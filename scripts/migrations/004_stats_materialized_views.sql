@@ -0,0 +1,50 @@
+-- Migration 004: materialized views behind the /stats endpoints
+-- Precomputes the full-table aggregates so /stats, /stats/artists and
+-- /stats/years read a handful of rows instead of scanning songs.
+-- Enable with STATS_USE_MATERIALIZED_VIEWS=true; the API refreshes them every
+-- STATS_MV_REFRESH_SECONDS (REFRESH ... CONCURRENTLY needs the unique indexes).
+--
+-- Run manually:
+--   psql "$DATABASE_URL" -f scripts/migrations/004_stats_materialized_views.sql
+
+-- One row with the dataset-wide totals
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_song_stats AS
+SELECT
+    1 AS id,
+    count(*) AS total_songs,
+    count(DISTINCT artist_name) AS total_artists,
+    count(*) FILTER (WHERE embedding IS NOT NULL) AS songs_with_embeddings,
+    min(year) AS min_year,
+    max(year) AS max_year,
+    count(DISTINCT year) AS unique_years,
+    avg(length(lyrics)) FILTER (WHERE lyrics IS NOT NULL AND lyrics != '') AS avg_lyrics_length
+FROM songs;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_song_stats_id ON mv_song_stats (id);
+
+-- Per-artist aggregates (songs with non-empty lyrics, as /stats/artists reports)
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_artist_stats AS
+SELECT
+    artist_name,
+    count(*) AS song_count,
+    min(year) AS earliest_year,
+    max(year) AS latest_year,
+    avg(length(lyrics)) AS avg_lyrics_length
+FROM songs
+WHERE lyrics IS NOT NULL AND lyrics != ''
+GROUP BY artist_name;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_artist_stats_artist_name ON mv_artist_stats (artist_name);
+CREATE INDEX IF NOT EXISTS idx_mv_artist_stats_song_count ON mv_artist_stats (song_count DESC);
+
+-- Per-year aggregates
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_year_stats AS
+SELECT
+    year,
+    count(*) AS song_count,
+    count(DISTINCT artist_name) AS artist_count
+FROM songs
+WHERE year IS NOT NULL
+GROUP BY year;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_year_stats_year ON mv_year_stats (year);
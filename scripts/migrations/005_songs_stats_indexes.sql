@@ -0,0 +1,20 @@
+-- Migration 005: indexes for the /stats aggregates
+-- idx_songs_year_artist_name: GROUP BY year + count(DISTINCT artist_name)
+--   (/stats/years) becomes an index-only scan feeding a GroupAggregate.
+-- idx_songs_id_with_embedding: small partial index that answers
+--   count(*) FILTER (WHERE embedding IS NOT NULL) and the "any embeddings?"
+--   LIMIT 1 probe without touching the heap (the embedding itself is too
+--   wide to index with a btree).
+-- GROUP BY artist_name is already served by idx_songs_artist_name.
+--
+-- Run manually (outside a transaction block):
+--   psql "$DATABASE_URL" -f scripts/migrations/005_songs_stats_indexes.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_year_artist_name
+    ON songs (year, artist_name) WHERE year IS NOT NULL;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_id_with_embedding
+    ON songs (id) WHERE embedding IS NOT NULL;
+
+-- Index-only scans need an up-to-date visibility map
+VACUUM ANALYZE songs;
@@ -0,0 +1,18 @@
+-- Migration 006: stored lyrics length for the /stats aggregates
+-- avg(length(lyrics)) detoasts every lyrics value on each stats call.
+-- A stored generated column keeps the length as a plain integer, and the
+-- covering index lets /stats/artists run as an index-only scan.
+--
+-- Note: adding a stored generated column rewrites the table (ACCESS
+-- EXCLUSIVE lock for the duration); run it in a maintenance window.
+--
+-- Run manually (outside a transaction block):
+--   psql "$DATABASE_URL" -f scripts/migrations/006_songs_lyrics_len.sql
+
+ALTER TABLE songs
+    ADD COLUMN IF NOT EXISTS lyrics_len integer GENERATED ALWAYS AS (length(lyrics)) STORED;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_artist_name_stats
+    ON songs (artist_name) INCLUDE (year, lyrics_len) WHERE lyrics_len > 0;
+
+VACUUM ANALYZE songs;
@@ -0,0 +1,92 @@
+-- Migration 007: artist_summary table maintained by triggers on songs
+-- /stats/artists reads top-N artists from this small table instead of
+-- aggregating songs (enable with STATS_USE_ARTIST_SUMMARY=true).
+-- Statement-level triggers with transition tables recompute each affected
+-- artist once per statement, so bulk loads touch every artist only once.
+-- Counts follow /stats/artists: only songs with non-empty lyrics.
+--
+-- Run manually:
+--   psql "$DATABASE_URL" -f scripts/migrations/007_artist_summary.sql
+
+CREATE TABLE IF NOT EXISTS artist_summary (
+    artist_name VARCHAR(255) PRIMARY KEY,
+    song_count INTEGER NOT NULL,
+    earliest_year INTEGER,
+    latest_year INTEGER,
+    avg_lyrics_length NUMERIC,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_artist_summary_song_count ON artist_summary (song_count DESC);
+
+-- Recompute the summary rows of the given artists (index scan on idx_songs_artist_name_stats)
+CREATE OR REPLACE FUNCTION refresh_artist_summary(artists TEXT[]) RETURNS void AS $$
+BEGIN
+    DELETE FROM artist_summary WHERE artist_name = ANY(artists);
+
+    INSERT INTO artist_summary (artist_name, song_count, earliest_year, latest_year, avg_lyrics_length, updated_at)
+    SELECT artist_name, count(*), min(year), max(year), avg(lyrics_len), now()
+    FROM songs
+    WHERE artist_name = ANY(artists) AND lyrics_len > 0
+    GROUP BY artist_name;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION trg_songs_artist_summary() RETURNS trigger AS $$
+DECLARE
+    artists TEXT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        artists := ARRAY(SELECT DISTINCT artist_name FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        artists := ARRAY(SELECT DISTINCT artist_name FROM old_rows);
+    ELSE
+        -- Only rows whose summarized columns changed (embedding updates are skipped)
+        artists := ARRAY(
+            SELECT o.artist_name
+            FROM old_rows o JOIN new_rows n USING (id)
+            WHERE o.artist_name IS DISTINCT FROM n.artist_name
+               OR o.year IS DISTINCT FROM n.year
+               OR o.lyrics_len IS DISTINCT FROM n.lyrics_len
+            UNION
+            SELECT n.artist_name
+            FROM old_rows o JOIN new_rows n USING (id)
+            WHERE o.artist_name IS DISTINCT FROM n.artist_name
+               OR o.year IS DISTINCT FROM n.year
+               OR o.lyrics_len IS DISTINCT FROM n.lyrics_len
+        );
+    END IF;
+
+    IF cardinality(artists) > 0 THEN
+        PERFORM refresh_artist_summary(artists);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables require one trigger per event
+DROP TRIGGER IF EXISTS trg_songs_artist_summary_insert ON songs;
+CREATE TRIGGER trg_songs_artist_summary_insert
+    AFTER INSERT ON songs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_songs_artist_summary();
+
+DROP TRIGGER IF EXISTS trg_songs_artist_summary_update ON songs;
+CREATE TRIGGER trg_songs_artist_summary_update
+    AFTER UPDATE ON songs
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_songs_artist_summary();
+
+DROP TRIGGER IF EXISTS trg_songs_artist_summary_delete ON songs;
+CREATE TRIGGER trg_songs_artist_summary_delete
+    AFTER DELETE ON songs
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION trg_songs_artist_summary();
+
+-- Backfill from the existing songs
+INSERT INTO artist_summary (artist_name, song_count, earliest_year, latest_year, avg_lyrics_length)
+SELECT artist_name, count(*), min(year), max(year), avg(lyrics_len)
+FROM songs
+WHERE lyrics_len > 0
+GROUP BY artist_name
+ON CONFLICT (artist_name) DO NOTHING;
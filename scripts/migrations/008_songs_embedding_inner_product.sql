@@ -0,0 +1,37 @@
+-- Migration 008: inner-product HNSW search over unit-length embeddings
+-- OpenAI embeddings are L2-normalized, so cosine distance is 1 - dot(a, b) and
+-- the search can order by embedding <#> :query (negative inner product), which
+-- skips the two vector norms computed per distance by <=>.
+--
+-- Rebuilds the HNSW index with halfvec_ip_ops. Deploy together with the code
+-- that searches with <#>: until the new index exists the search still returns
+-- correct results, but without an index to serve it.
+--
+-- Run manually (outside a transaction block, CREATE INDEX CONCURRENTLY
+-- does not support transactions):
+--   psql "$DATABASE_URL" -f scripts/migrations/008_songs_embedding_inner_product.sql
+
+-- Normalize anything stored before the API started normalizing embeddings
+UPDATE songs
+SET embedding = l2_normalize(embedding)
+WHERE embedding IS NOT NULL AND abs(l2_norm(embedding) - 1) >= 0.001;
+
+-- Keep them unit length (tolerance covers the float16 rounding of halfvec)
+ALTER TABLE songs DROP CONSTRAINT IF EXISTS ck_songs_embedding_unit_norm;
+ALTER TABLE songs ADD CONSTRAINT ck_songs_embedding_unit_norm
+    CHECK (embedding IS NULL OR abs(l2_norm(embedding) - 1) < 0.01) NOT VALID;
+ALTER TABLE songs VALIDATE CONSTRAINT ck_songs_embedding_unit_norm;
+
+SET max_parallel_maintenance_workers = 7;
+SET maintenance_work_mem = '2GB';
+
+-- Build the new index before dropping the cosine one, so search is never unindexed
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_embedding_hnsw_ip
+    ON songs USING hnsw (embedding halfvec_ip_ops)
+    WITH (m = 24, ef_construction = 128);
+
+DROP INDEX CONCURRENTLY IF EXISTS idx_songs_embedding_hnsw;
+ALTER INDEX idx_songs_embedding_hnsw_ip RENAME TO idx_songs_embedding_hnsw;
+
+RESET maintenance_work_mem;
+RESET max_parallel_maintenance_workers;
@@ -0,0 +1,21 @@
+-- Migration 009: binary-quantized HNSW index for the two-stage search
+-- binary_quantize keeps one bit (the sign) per dimension: 192 bytes per
+-- 1536-dim vector instead of 3 KB of halfvec. With
+-- VECTOR_SEARCH_BINARY_PREFILTER=true the search takes the nearest candidates
+-- by Hamming distance from this index and reranks them by inner product on
+-- the halfvec embedding.
+--
+-- Run manually (outside a transaction block, CREATE INDEX CONCURRENTLY
+-- does not support transactions):
+--   psql "$DATABASE_URL" -f scripts/migrations/009_songs_embedding_binary_hnsw.sql
+
+SET max_parallel_maintenance_workers = 7;
+SET maintenance_work_mem = '2GB';
+
+-- The expression must match binary_quantized() in app/models/song.py
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_embedding_bit_hnsw
+    ON songs USING hnsw ((binary_quantize(embedding)::bit(1536)) bit_hamming_ops)
+    WITH (m = 24, ef_construction = 128);
+
+RESET maintenance_work_mem;
+RESET max_parallel_maintenance_workers;
@@ -0,0 +1,40 @@
+-- Migration 010: shrink stored embeddings to 512 dimensions (Matryoshka)
+-- text-embedding-3-small is trained so that a prefix of its vector, re-normalized,
+-- is itself a good embedding: the API returns exactly l2_normalize(prefix) when
+-- asked for fewer dimensions. Truncating in place keeps the stored vectors
+-- consistent with new query embeddings, without re-embedding any song.
+--
+-- Deploy together with EMBEDDING_DIMENSIONS=512 (the songs column and the bit
+-- index follow that setting). To use another size, replace 512 below.
+--
+-- Run manually (the index builds run outside a transaction block, CREATE
+-- INDEX CONCURRENTLY does not support transactions):
+--   psql "$DATABASE_URL" -f scripts/migrations/010_songs_embedding_shrink.sql
+
+BEGIN;
+
+-- Both HNSW indexes depend on the column type (the bit one casts to bit(1536))
+DROP INDEX IF EXISTS idx_songs_embedding_hnsw;
+DROP INDEX IF EXISTS idx_songs_embedding_bit_hnsw;
+
+-- Keep the first 512 dimensions and re-normalize (ck_songs_embedding_unit_norm)
+ALTER TABLE songs
+    ALTER COLUMN embedding TYPE halfvec(512)
+    USING l2_normalize(subvector(embedding, 1, 512));
+
+COMMIT;
+
+SET max_parallel_maintenance_workers = 7;
+SET maintenance_work_mem = '2GB';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_embedding_hnsw
+    ON songs USING hnsw (embedding halfvec_ip_ops)
+    WITH (m = 24, ef_construction = 128);
+
+-- The expression must match binary_quantized() in app/models/song.py
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_embedding_bit_hnsw
+    ON songs USING hnsw ((binary_quantize(embedding)::bit(512)) bit_hamming_ops)
+    WITH (m = 24, ef_construction = 128);
+
+RESET maintenance_work_mem;
+RESET max_parallel_maintenance_workers;
@@ -0,0 +1,13 @@
+-- Migration 011: partial index over the songs still waiting for an embedding
+-- scripts/generate_embeddings.py pages through them with
+--   WHERE embedding IS NULL AND id > :last_id ORDER BY id LIMIT n
+-- which this index serves as a plain range scan. It only holds the songs
+-- without an embedding, so it stays (nearly) empty once the corpus is embedded.
+--
+-- Run manually (outside a transaction block, CREATE INDEX CONCURRENTLY
+-- does not support transactions):
+--   psql "$DATABASE_URL" -f scripts/migrations/011_songs_id_without_embedding.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_songs_id_without_embedding
+    ON songs (id)
+    WHERE embedding IS NULL;
@@ -6,12 +6,11 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
-import asyncio
 from sqlalchemy import text
 from app.db.database import engine, SessionLocal
 from app.models.song import Song
 
-async def setup_database():
+def setup_database():
     """Setup database with pgvector extension and tables"""
     
     print("🔧 Setting up database for production...")
@@ -21,8 +20,9 @@ async def setup_database():
         db = SessionLocal()
         
         # Enable pgvector extension
-        print("📦 Enabling pgvector extension...")
+        print("📦 Enabling pgvector and pg_trgm extensions...")
         db.execute(text("CREATE EXTENSION IF NOT EXISTS vector;"))
+        db.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm;"))
         db.commit()
         
         # Create tables
@@ -42,4 +42,4 @@ async def setup_database():
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(setup_database())
+    setup_database()
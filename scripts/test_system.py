@@ -8,9 +8,11 @@ import sys
 # Add app directory to Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
 
+from sqlalchemy import func, select
+
 from app.db.database import SessionLocal
 from app.models.song import Song
-from app.config import settings
+from app.config import get_settings
 
 
 def test_database_connection():
@@ -18,11 +20,25 @@ def test_database_connection():
     print("🔍 Testing database connection...")
     
     try:
-        db = SessionLocal()
+        # O with devolve a conexão ao pool mesmo se uma consulta falhar
+        with SessionLocal() as db:
+            # Test basic query (both counts in a single scan)
+            total_songs, songs_with_embeddings = db.execute(
+                select(
+                    func.count(),
+                    func.count().filter(Song.embedding.is_not(None))
+                )
+            ).one()
+            
+            # Sample songs: only the 100 characters shown, not the whole lyrics
+            sample_songs = db.execute(
+                select(
+                    Song.track_name,
+                    Song.artist_name,
+                    func.substr(Song.full_text, 1, 100).label("preview")
+                ).limit(3)
+            ).all()
         
-        # Test basic query
-        total_songs = db.query(Song).count()
-        songs_with_embeddings = db.query(Song).filter(Song.embedding.isnot(None)).count()
         songs_without_embeddings = total_songs - songs_with_embeddings
         
         print(f"✅ Database connection successful!")
@@ -31,13 +47,11 @@ def test_database_connection():
         print(f"   - Songs without embeddings: {songs_without_embeddings}")
         
         # Show sample songs
-        sample_songs = db.query(Song).limit(3).all()
         print(f"\n📋 Sample songs:")
         for song in sample_songs:
             print(f"   - {song.track_name} by {song.artist_name}")
-            print(f"     Full text preview: {song.full_text[:100]}...")
+            print(f"     Full text preview: {song.preview}...")
         
-        db.close()
         return True
         
     except Exception as e:
@@ -50,12 +64,14 @@ def test_configuration():
     print("\n⚙️  Testing configuration...")
     
     try:
+        settings = get_settings()
         print(f"   - Database URL: {settings.DATABASE_URL[:50]}...")
         print(f"   - Embedding model: {settings.EMBEDDING_MODEL}")
         print(f"   - Embedding dimensions: {settings.EMBEDDING_DIMENSIONS}")
         
         # Check if OpenAI API key is set
-        if settings.OPENAI_API_KEY and settings.OPENAI_API_KEY != "REPLACE_WITH_YOUR_NEW_API_KEY_FROM_OPENAI_PLATFORM":
+        api_key = settings.OPENAI_API_KEY
+        if api_key and api_key != "REPLACE_WITH_YOUR_NEW_API_KEY_FROM_OPENAI_PLATFORM":
             print(f"   - OpenAI API key: ✅ Set (***hidden***)")
             return True
         else:
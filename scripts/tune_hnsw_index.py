@@ -0,0 +1,30 @@
+"""
+Rebuild the pgvector HNSW index when the corpus size calls for other build parameters
+
+Run after large data loads (the API only applies ef_search at startup):
+    python scripts/tune_hnsw_index.py
+"""
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+
+from app.db.database import SessionLocal
+from app.services.embedding_service import tune_hnsw_index
+
+
+def main():
+    """Tune (and rebuild, if needed) the HNSW index"""
+    print("🔧 Checking HNSW index parameters...")
+    
+    try:
+        with SessionLocal() as db:
+            params = tune_hnsw_index(db, rebuild=True)
+        print(f"✅ HNSW parameters: {params}")
+    except Exception as e:
+        print(f"❌ HNSW tuning failed: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,26 @@ Simple test script for embedding generation
 """
 
 import os
+from functools import lru_cache
+
 from openai import OpenAI
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# Load environment variables (the .env file is only read when the key is not exported)
+if "OPENAI_API_KEY" not in os.environ:
+    load_dotenv()
+
+
+@lru_cache(maxsize=1)
+def get_client() -> OpenAI:
+    """OpenAI client shared by every call, so its HTTP connection pool is reused"""
+    return OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
 
 def test_embedding():
     """Test basic embedding generation"""
     try:
-        # Initialize client
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        client = get_client()
         
         # Test embedding generation
         response = client.embeddings.create(
@@ -0,0 +1,55 @@
+"""
+Tests for the token-aware batching of embedding requests
+"""
+
+import pytest
+
+from app.services import embedding_service
+from app.services.embedding_service import CHARS_PER_TOKEN_ESTIMATE, count_tokens, pack_batches
+
+
+def test_pack_batches_empty_input():
+    assert pack_batches([], []) == []
+
+
+def test_pack_batches_splits_on_item_limit():
+    texts = [f"song {i}" for i in range(5)]
+    assert pack_batches(texts, [1] * 5, max_items=2, max_tokens=100) == [
+        ["song 0", "song 1"], ["song 2", "song 3"], ["song 4"]
+    ]
+
+
+def test_pack_batches_splits_on_token_limit():
+    texts = ["a", "b", "c", "d"]
+    assert pack_batches(texts, [40, 40, 30, 10], max_items=10, max_tokens=100) == [
+        ["a", "b"], ["c", "d"]
+    ]
+
+
+def test_pack_batches_text_over_token_limit_gets_its_own_batch():
+    texts = ["short", "huge", "short again"]
+    assert pack_batches(texts, [10, 500, 10], max_items=10, max_tokens=100) == [
+        ["short"], ["huge"], ["short again"]
+    ]
+
+
+def test_pack_batches_keeps_input_order():
+    texts = [f"t{i}" for i in range(50)]
+    batches = pack_batches(texts, [i % 7 + 1 for i in range(50)], max_items=8, max_tokens=20)
+    assert [text for batch in batches for text in batch] == texts
+    assert all(len(batch) <= 8 for batch in batches)
+
+
+def test_count_tokens_estimate_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(embedding_service, "_tiktoken_encoding", lambda model: None)
+    texts = ["", "abc", "x" * 30]
+    assert count_tokens(texts, "text-embedding-3-small") == [
+        1, 3 // CHARS_PER_TOKEN_ESTIMATE + 1, 30 // CHARS_PER_TOKEN_ESTIMATE + 1
+    ]
+
+
+def test_count_tokens_with_tiktoken():
+    pytest.importorskip("tiktoken")
+    counts = count_tokens(["", "hello world"], "text-embedding-3-small")
+    assert counts[0] == 0
+    assert counts[1] > 0
@@ -0,0 +1,85 @@
+"""
+Tests for the OpenAI retry delay (Retry-After, x-ratelimit-reset-*, backoff)
+"""
+
+import httpx
+import pytest
+
+from app.services.embedding_service import (
+    EMBEDDING_RETRY_INITIAL_DELAY,
+    EMBEDDING_RETRY_MAX_DELAY,
+    parse_reset_duration,
+    retry_delay,
+)
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("20ms", 0.02),
+    ("250ms", 0.25),
+    ("1.5s", 1.5),
+    ("1m30s", 90.0),
+    ("6m0s", 360.0),
+    ("1h", 3600.0),
+    (" 2s ", 2.0),
+])
+def test_parse_reset_duration(value, seconds):
+    assert parse_reset_duration(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("value", ["", "abc", "10", "1x", "1m30", "1s garbage"])
+def test_parse_reset_duration_rejects_unparseable_values(value):
+    assert parse_reset_duration(value) is None
+
+
+def test_retry_delay_honors_retry_after():
+    response = httpx.Response(429, headers={
+        "retry-after": "3",
+        "x-ratelimit-reset-requests": "20s",
+        "x-ratelimit-remaining-requests": "0",
+    })
+    assert retry_delay(0, response) == 3.0
+
+
+def test_retry_delay_caps_retry_after():
+    response = httpx.Response(503, headers={"retry-after": "3600"})
+    assert retry_delay(0, response) == EMBEDDING_RETRY_MAX_DELAY * 4
+
+
+def test_retry_delay_waits_for_the_exhausted_limit():
+    response = httpx.Response(429, headers={
+        "x-ratelimit-reset-requests": "1.5s",
+        "x-ratelimit-remaining-requests": "0",
+        # Limite de tokens não esgotado: o reset dele não conta
+        "x-ratelimit-reset-tokens": "6m0s",
+        "x-ratelimit-remaining-tokens": "1000",
+    })
+    delay = retry_delay(0, response)
+    assert 1.5 <= delay <= 1.5 + EMBEDDING_RETRY_INITIAL_DELAY
+
+
+def test_retry_delay_caps_ratelimit_reset():
+    response = httpx.Response(429, headers={
+        "x-ratelimit-reset-tokens": "1m30s",
+        "x-ratelimit-remaining-tokens": "0",
+    })
+    assert retry_delay(0, response) == EMBEDDING_RETRY_MAX_DELAY * 4
+
+
+def test_retry_delay_ignores_ratelimit_headers_outside_429():
+    response = httpx.Response(500, headers={
+        "x-ratelimit-reset-requests": "20s",
+        "x-ratelimit-remaining-requests": "0",
+    })
+    assert retry_delay(0, response) <= EMBEDDING_RETRY_INITIAL_DELAY
+
+
+@pytest.mark.parametrize("attempt", range(8))
+def test_retry_delay_exponential_backoff_with_jitter(attempt):
+    delay = min(EMBEDDING_RETRY_INITIAL_DELAY * 2 ** attempt, EMBEDDING_RETRY_MAX_DELAY)
+    assert delay / 2 <= retry_delay(attempt) <= delay
+
+
+def test_retry_delay_http_date_retry_after_falls_back_to_backoff():
+    response = httpx.Response(429, headers={"retry-after": "Wed, 21 Oct 2026 07:28:00 GMT"})
+    delay = EMBEDDING_RETRY_INITIAL_DELAY * 2
+    assert delay / 2 <= retry_delay(1, response) <= delay
@@ -0,0 +1,120 @@
+"""
+Tests for the in-process semantic search cache and the Redis cache keys
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from app.services.search_cache import SHARED_CACHE_PREFIX, SemanticSearchCache, embedding_cache_key
+from app.services.similarity import normalize_rows
+
+PARAMS = (10, 0.0, True)
+
+
+class FakeClock:
+    """Controllable replacement for time.monotonic"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+def unit(values) -> np.ndarray:
+    return normalize_rows(np.asarray(values, dtype=np.float32))
+
+
+def test_exact_hit_ignores_case_and_whitespace(clock):
+    cache = SemanticSearchCache()
+    cache.set("Lost  Love", unit([1, 0, 0]), PARAMS, {"total_results": 1})
+    assert cache.get_exact("  lost love ", PARAMS) == {"total_results": 1}
+
+
+def test_exact_miss_on_other_params(clock):
+    cache = SemanticSearchCache()
+    cache.set("lost love", unit([1, 0, 0]), PARAMS, {"total_results": 1})
+    assert cache.get_exact("lost love", (5, 0.0, True)) is None
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = SemanticSearchCache(ttl_seconds=60)
+    cache.set("lost love", unit([1, 0, 0]), PARAMS, {"total_results": 1})
+    clock.now += 59
+    assert cache.get_exact("lost love", PARAMS) is not None
+    clock.now += 2
+    assert cache.get_exact("lost love", PARAMS) is None
+    assert cache.get_similar(unit([1, 0, 0]), PARAMS) is None
+
+
+def test_similar_hit_above_threshold(clock):
+    cache = SemanticSearchCache(similarity_threshold=0.95)
+    cache.set("lost love", unit([1, 0.1, 0]), PARAMS, {"total_results": 1})
+    assert cache.get_similar(unit([1, 0.12, 0]), PARAMS) == {"total_results": 1}
+
+
+def test_similar_miss_below_threshold(clock):
+    cache = SemanticSearchCache(similarity_threshold=0.95)
+    cache.set("lost love", unit([1, 0, 0]), PARAMS, {"total_results": 1})
+    assert cache.get_similar(unit([1, 1, 0]), PARAMS) is None
+
+
+def test_similar_skips_entries_with_other_params(clock):
+    cache = SemanticSearchCache(similarity_threshold=0.9)
+    cache.set("a", unit([1, 0, 0]), (5, 0.0, True), {"total_results": 5})
+    cache.set("b", unit([1, 0.2, 0]), PARAMS, {"total_results": 10})
+    assert cache.get_similar(unit([1, 0, 0]), PARAMS) == {"total_results": 10}
+
+
+def test_similar_sees_entries_added_after_a_lookup(clock):
+    cache = SemanticSearchCache()
+    cache.set("a", unit([1, 0, 0]), PARAMS, {"total_results": 1})
+    assert cache.get_similar(unit([0, 1, 0]), PARAMS) is None
+    cache.set("b", unit([0, 1, 0]), PARAMS, {"total_results": 2})
+    assert cache.get_similar(unit([0, 1, 0]), PARAMS) == {"total_results": 2}
+
+
+def test_lru_eviction_keeps_recently_used(clock):
+    cache = SemanticSearchCache(max_entries=2)
+    cache.set("a", unit([1, 0, 0]), PARAMS, {"total_results": 1})
+    cache.set("b", unit([0, 1, 0]), PARAMS, {"total_results": 2})
+    assert cache.get_exact("a", PARAMS) is not None  # "a" passa a ser a mais recente
+    cache.set("c", unit([0, 0, 1]), PARAMS, {"total_results": 3})
+
+    assert cache.get_exact("b", PARAMS) is None
+    assert cache.get_exact("a", PARAMS) is not None
+    assert cache.get_exact("c", PARAMS) is not None
+    assert cache.get_similar(unit([0, 1, 0]), PARAMS) is None
+
+
+def test_invalidate_drops_both_tiers(clock):
+    cache = SemanticSearchCache()
+    cache.set("a", unit([1, 0, 0]), PARAMS, {"total_results": 1})
+    assert cache.get_similar(unit([1, 0, 0]), PARAMS) is not None
+    cache.invalidate()
+    assert cache.get_exact("a", PARAMS) is None
+    assert cache.get_similar(unit([1, 0, 0]), PARAMS) is None
+
+
+def test_embedding_cache_key_absorbs_float_noise():
+    rng = np.random.default_rng(0)
+    embedding = np.round(unit(rng.standard_normal(64)), 3) + 0.0002
+    noisy = embedding + rng.uniform(-0.0001, 0.0001, 64)
+    assert embedding_cache_key(embedding, PARAMS) == embedding_cache_key(noisy, PARAMS)
+
+
+def test_embedding_cache_key_depends_on_vector_and_params():
+    embedding = unit([0.6, 0.8, 0])
+    key = embedding_cache_key(embedding, PARAMS)
+    assert key.startswith(SHARED_CACHE_PREFIX)
+    assert key != embedding_cache_key(embedding, (5, 0.0, True))
+    assert key != embedding_cache_key(unit([0.8, 0.6, 0]), PARAMS)
@@ -0,0 +1,33 @@
+"""
+Tests for the opaque keyset cursors of GET /songs
+"""
+
+import base64
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.songs import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize("last_id", [0, 1, 42, 2**31 - 1, 10**12])
+def test_cursor_round_trip(last_id):
+    assert decode_cursor(encode_cursor(last_id)) == last_id
+
+
+def test_cursor_is_url_safe():
+    cursor = encode_cursor(10**12)
+    assert set(cursor) <= set("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not a cursor!",
+    "a",  # base64 com padding incorreto
+    base64.urlsafe_b64encode(b"abc").decode(),  # não é um id
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),  # não é UTF-8
+])
+def test_decode_cursor_rejects_invalid_cursors(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor)
+    assert exc_info.value.status_code == 400
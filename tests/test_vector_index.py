@@ -0,0 +1,94 @@
+"""
+Tests for the in-process (memory/auto) vector index
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from pgvector.psycopg import HalfVector
+
+from app.services import similarity
+from app.services.similarity import cosine_similarities, normalize_rows
+from app.services.vector_index import InMemoryVectorIndex
+
+
+class FakeSession:
+    """Stands in for the Session: execute(...).partitions() yields rows of (id, embedding)"""
+
+    def __init__(self, vectors: np.ndarray, partition_size: int = 7):
+        self.rows = [
+            SimpleNamespace(id=song_id, embedding=HalfVector(vector))
+            for song_id, vector in enumerate(vectors, start=1)
+        ]
+        self.partition_size = partition_size
+
+    def execute(self, query):
+        return self
+
+    def partitions(self):
+        for start in range(0, len(self.rows), self.partition_size):
+            yield self.rows[start:start + self.partition_size]
+
+
+@pytest.fixture
+def numpy_only(monkeypatch):
+    """Force the NumPy path, with tiny chunks so every search spans several of them"""
+    monkeypatch.setattr(similarity, "simsimd", None)
+    monkeypatch.setattr(similarity, "SIMILARITY_CHUNK_ROWS", 8)
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(42)
+    return normalize_rows(rng.standard_normal((50, 16))).astype(np.float16)
+
+
+def test_chunked_scores_match_full_product(numpy_only, vectors):
+    query = vectors[3]
+    expected = vectors.astype(np.float32) @ query.astype(np.float32)
+    scores = cosine_similarities(vectors, query, rows_normalized=True, query_normalized=True)
+    assert scores.dtype == np.float32
+    np.testing.assert_allclose(scores, expected, rtol=1e-6)
+
+
+def test_chunked_scores_normalize_rows(numpy_only, vectors):
+    query = vectors[0].astype(np.float32)
+    scaled = (vectors.astype(np.float32) * 3).astype(np.float16)
+    np.testing.assert_allclose(
+        cosine_similarities(scaled, query),
+        cosine_similarities(vectors, query, rows_normalized=True),
+        atol=1e-3
+    )
+
+
+def test_search_ranks_by_similarity(numpy_only, vectors):
+    index = InMemoryVectorIndex(dimensions=16)
+    assert index.load(FakeSession(vectors)) == 50
+
+    hits = index.search(vectors[10], limit=5)
+    assert len(hits) == 5
+    assert hits[0][0] == 11  # ids start at 1
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-2)
+    scores = [score for _, score in hits]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_search_limit_above_corpus_size(numpy_only, vectors):
+    index = InMemoryVectorIndex(dimensions=16)
+    index.load(FakeSession(vectors[:3]))
+    assert len(index.search(vectors[0], limit=10)) == 3
+
+
+def test_auto_backend_disables_index_above_max_vectors(vectors):
+    index = InMemoryVectorIndex(dimensions=16, max_vectors=20)
+    assert index.load(FakeSession(vectors)) == 0
+    assert not index.ready
+    assert index.search(vectors[0], limit=5) == []
+
+
+def test_empty_corpus(vectors):
+    index = InMemoryVectorIndex(dimensions=16)
+    assert index.load(FakeSession(vectors[:0])) == 0
+    assert index.ready
+    assert index.search(vectors[0], limit=5) == []